@@ -2,20 +2,46 @@
     dependencies module    
 """
 
-from fastapi import Form, UploadFile, File
+import os
+import hmac
+from functools import cache
+from typing import AsyncIterator
+
+import aiofiles
+import aiofiles.os
+from fastapi import Form, UploadFile, File, Header, HTTPException
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 
 from models.schemas import MeterUploadData
 from services.milvus_service import MilvusService
 from services.bedrock_service import BedrockService
 
-bedrock_service = BedrockService()
-milvus_service = MilvusService()
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB chunks amortize syscalls while keeping memory flat
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+MAX_REQUEST_SIZE = MAX_UPLOAD_SIZE + 64 * 1024  # room for form fields and multipart boundaries
+
+# Admin endpoints stay disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
+@cache
 def get_milvus_service() -> MilvusService:
-    return milvus_service
+    return MilvusService()
 
+@cache
 def get_bedrock_service() -> BedrockService:
-    return bedrock_service
+    return BedrockService()
+
+def require_admin_token(x_admin_token: str = Header("")) -> None:
+    """
+        Hide admin endpoints unless ADMIN_TOKEN is set and matches the X-Admin-Token header
+    """
+
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    if not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
 
 async def create_upload_data(
         city: str = Form(...),
@@ -24,16 +50,49 @@ async def create_upload_data(
         file: UploadFile = File(...)
     ) -> MeterUploadData:
     """
-        Create validated upload data model
+        Create validated upload data model (text fields only)
     """
 
-    content = await file.read()
-    
-    return MeterUploadData(
-        city=city,
-        street_name=street_name,
-        street_number=street_number,
-        file_content=content,
-        file_name=file.filename or "",
-        content_type=file.content_type or ""
-    )
\ No newline at end of file
+    # Raised inside a dependency body, so it must be re-raised as a request error to get a 422 instead of a 500
+    try:
+        return MeterUploadData(
+            city=city,
+            street_name=street_name,
+            street_number=street_number,
+            file_name=file.filename or "",
+            content_type=file.content_type or ""
+        )
+
+    except ValidationError as exc:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in exc.errors(include_url=False)]
+        ) from exc
+
+async def stream_upload_file(file: UploadFile = File(...)) -> AsyncIterator[str]:
+    """
+        Stream uploaded image to a temporary file and yield its path
+    """
+
+    file_path = None
+    file_size = 0
+
+    try:
+        async with aiofiles.tempfile.NamedTemporaryFile("wb", delete=False) as tmp:
+            file_path = tmp.name
+
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+
+                if file_size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail="File too large")
+
+                await tmp.write(chunk)
+
+        if file_size == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+
+        yield file_path
+
+    finally:
+        if file_path:
+            await aiofiles.os.remove(file_path)
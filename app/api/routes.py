@@ -3,18 +3,22 @@
 """
 
 import os
-import uuid
-import time
+import re
+import asyncio
+import orjson
 import logging
+from ulid import ULID
 from datetime import datetime
+from typing import AsyncIterator
 
-from fastapi import HTTPException, APIRouter, Depends
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import HTTPException, APIRouter, Depends, Request
+from fastapi.responses import HTMLResponse, FileResponse, ORJSONResponse, Response, StreamingResponse
 
-from api.utils import convert_milvus_result
-from services.search_service import search_by_address, search_by_context, search_similar_readings, search_by_recency
-from api.dependencies import create_upload_data, get_bedrock_service, get_milvus_service
-from models.schemas import UploadResponse, ChatQuery, ChatResponse, MeterUploadData
+from services.milvus_service import EMBEDDING_DIM, as_vector
+from services.query_cache import query_cache, qv_cache
+from services.search_service import search_by_address, search_by_context, search_similar_readings, search_both, search_by_recency
+from api.dependencies import create_upload_data, stream_upload_file, get_bedrock_service, get_milvus_service, require_admin_token
+from models.schemas import UploadResponse, ChatQuery, ChatResponse, MeterUploadData, MeterAddress
 
 
 router = APIRouter()
@@ -22,41 +26,61 @@ router = APIRouter()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@router.get("/", response_class=HTMLResponse)
-async def root() -> HTMLResponse:
+# Chat search strategies in priority order, matched in a single regex pass each
+CHAT_ROUTES = (
+    ("recency", re.compile(r"\b(?:last|latest|recent|newest|most recent)\b", re.IGNORECASE)),
+    ("context", re.compile(r"\b(?:usage|high|low|consumption|similar|pattern|highest|lowest)\b", re.IGNORECASE)),
+    ("address", re.compile(r"\b(?:address|street|city|location|where|at)\b", re.IGNORECASE)),
+)
+
+READINGS_BATCH_SIZE = 100
+HEALTH_CHECK_TIMEOUT = 1.0
+
+FALLBACK_HTML = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Water Meter Scanner</title>
+            <style>
+                body { font-family: Arial, sans-serif; margin: 40px; }
+                .container { max-width: 800px; margin: 0 auto; }
+                h1 { color: #333; }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <h1>Water Meter Scanner</h1>
+                <p>AI-powered water meter reading extraction and analysis</p>
+                <h3>Available:</h3>
+                <ul>
+                    <li><a href="/docs">API Documentation</a></li>
+                </ul>
+            </div>
+        </body>
+        </html>
     """
-        Serve the main web interface
+
+def build_root_response() -> Response:
+    """
+        Build the main web interface response once at startup
     """
 
     static_file_path = os.path.join("static", "index.html")
 
-    return FileResponse(static_file_path) if os.path.exists(static_file_path) else HTMLResponse(
-        """
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Water Meter Scanner</title>
-                <style>
-                    body { font-family: Arial, sans-serif; margin: 40px; }
-                    .container { max-width: 800px; margin: 0 auto; }
-                    h1 { color: #333; }
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <h1>Water Meter Scanner</h1>
-                    <p>AI-powered water meter reading extraction and analysis</p>
-                    <h3>Available:</h3>
-                    <ul>
-                        <li><a href="/docs">API Documentation</a></li>
-                    </ul>
-                </div>
-            </body>
-            </html>
-        """
-    )
+    if os.path.exists(static_file_path):
+        return FileResponse(static_file_path, stat_result=os.stat(static_file_path))
+
+    return HTMLResponse(FALLBACK_HTML)
+
+@router.get("/", response_class=HTMLResponse)
+async def root(request: Request) -> Response:
+    """
+        Serve the main web interface
+    """
+
+    return request.app.state.root_response
     
-@router.get("/health")
+@router.get("/health", response_model=None)
 async def health_check(
         milvus_service = Depends(get_milvus_service),
         bedrock_service = Depends(get_bedrock_service)
@@ -65,13 +89,47 @@ async def health_check(
         Health check endpoint
     """
 
+    # A slow backend must not stall readiness probes
+    milvus_health, bedrock_health = await asyncio.gather(
+        asyncio.wait_for(milvus_service.health_check(), HEALTH_CHECK_TIMEOUT),
+        asyncio.wait_for(bedrock_service.health_check(), HEALTH_CHECK_TIMEOUT),
+        return_exceptions=True
+    )
+
     return {
         "status": "healthy",
-        "milvus": milvus_service.health_check(),
-        "bedrock": bedrock_service.health_check()
+        "milvus": health_result(milvus_health),
+        "bedrock": health_result(bedrock_health)
     }
 
-@router.get("/milvus-info")
+def health_result(result: dict | BaseException) -> dict:
+    """
+        Serialize a service health check outcome, including timeouts and errors
+    """
+
+    if isinstance(result, asyncio.TimeoutError):
+        return {"status": "timeout", "error": f"No response within {HEALTH_CHECK_TIMEOUT}s"}
+
+    if isinstance(result, BaseException):
+        return {"status": "error", "error": str(result)}
+
+    return result
+
+@router.get("/cache/stats", response_model=None)
+async def cache_stats(
+        bedrock_service = Depends(get_bedrock_service),
+    ) -> dict:
+    """
+        Search result and embedding cache statistics
+    """
+
+    return {
+        "query": query_cache.get_stats(),
+        "similarity": qv_cache.get_stats(),
+        "embedding": bedrock_service.get_embed_cache_stats()
+    }
+
+@router.get("/milvus-info", response_model=None)
 async def milvus_info(
         milvus_service = Depends(get_milvus_service),
     ) -> dict:
@@ -79,69 +137,96 @@ async def milvus_info(
         Get Milvus collection information
     """
 
-    info = milvus_service.get_collection_info()
+    info = await asyncio.to_thread(milvus_service.get_collection_info)
+
+    if not info:
+        raise HTTPException(status_code=503, detail="Milvus not initialized")
+
+    return info
 
-    return info if info else HTTPException(status_code=503, detail="Milvus not initialized")
+@router.post("/admin/rebuild-index", response_model=None, dependencies=[Depends(require_admin_token)])
+async def rebuild_index(
+        force: bool = False,
+        milvus_service = Depends(get_milvus_service),
+    ) -> dict:
+    """
+        Recompute nlist/nprobe and rebuild vector indexes once the collection has grown 4x
+    """
+
+    if not milvus_service.collection:
+        raise HTTPException(status_code=503, detail="Milvus not initialized")
+
+    return await milvus_service.rebuild_indexes(force)
     
 @router.post("/upload-meter", response_model=UploadResponse)
 async def upload_meter_reading(
         upload_data: MeterUploadData = Depends(create_upload_data),
+        image_path: str = Depends(stream_upload_file),
         milvus_service = Depends(get_milvus_service),
         bedrock_service = Depends(get_bedrock_service)
-    ) -> UploadResponse:
+    ) -> ORJSONResponse:
     """
         Upload water meter image and extract reading using vision model
     """
     
-    address_info = {
-        "city": upload_data.city,
-        "street_name": upload_data.street_name,
-        "street_number": upload_data.street_number
-    }
+    # Built once and hashable, so it doubles as the address embedding cache key
+    address = MeterAddress(upload_data.city, upload_data.street_name, upload_data.street_number)
 
     if not bedrock_service.connected:
             raise HTTPException(status_code=503, detail="Bedrock service not available")
         
-    logger.info(f"Processing meter image upload for {address_info}")
+    logger.info("Processing meter image upload for %s", address)
+
+    # Address embedding doesn't depend on the vision result, so overlap it with the analysis
+    address_task = asyncio.create_task(bedrock_service.generate_address_embedding(address))
 
     try:        
         # Analyze image using Vision LLM
-        vision_result = await bedrock_service.analyze_meter_image(upload_data.file_content, address_info)
+        vision_result = await bedrock_service.analyze_meter_image(image_path, address)
 
     except Exception as exc:
-        logger.error(f"❌ Bedrock vision analysis failed: {exc}")
+        address_task.cancel()
+        logger.error("❌ Bedrock vision analysis failed: %s", exc)
         raise HTTPException(status_code=500, detail="Vision analysis failed")
         
     # Check if analysis was successful
     if not vision_result or not isinstance(vision_result, dict):
+        address_task.cancel()
         raise HTTPException(status_code=500, detail="Vision analysis failed to return valid results")
 
     # Check confidence
     if not vision_result.get("reading_visible", False) and vision_result.get("confidence", 0) < 0.3:
-        logger.warning(f"Low confidence reading: {vision_result}")
+        logger.warning("Low confidence reading: %s", vision_result)
     
-    # Generate unique ID for this reading
-    reading_id = f"meter_{int(time.time())}_{str(uuid.uuid4())[:8]}"
-    
-    # Create full address string
-    full_address = f"{upload_data.street_number} {upload_data.street_name}, {upload_data.city}"
+    # Generate unique, time-ordered ID for this reading (its timestamp doubles as the reading time)
+    reading_ulid = ULID()
+    reading_id = f"meter_{reading_ulid}"
+    timestamp = int(reading_ulid.timestamp)
     
     try:
-        embeddings = await bedrock_service.generate_meter_embeddings(
-            address_info, 
+        combined_embedding = await bedrock_service.generate_value_embedding(
+            address, 
             vision_result["meter_value"], 
             vision_result.get("units", "cubic_meters")
         )
-    except:
-        logger.error(f"❌ Embedding generation failed: {exc}")
+        address_embedding = await address_task
+
+    except Exception as exc:
+        address_task.cancel()
+        logger.error("❌ Embedding generation failed: %s", exc)
         raise HTTPException(status_code=500, detail="Embedding generation failed")
 
+    embeddings = {
+        "address_embedding": address_embedding,
+        "combined_embedding": combined_embedding,
+        "full_address": address.full_address
+    }
+
     try:
         # Store in Milvus
-        timestamp = int(time.time())
         stored = await milvus_service.store_meter_reading(
             reading_id,
-            address_info,
+            address,
             vision_result["meter_value"],
             vision_result["confidence"],
             embeddings,
@@ -154,28 +239,28 @@ async def upload_meter_reading(
             logger.warning("Failed to store reading in Milvus, but extraction succeeded")
     
     except Exception as exc:
-        logger.error(f"❌ Failed to store reading in Milvus: {exc}")  
+        logger.error("❌ Failed to store reading in Milvus: %s", exc)  
         raise HTTPException(status_code=500, detail=f"❌ Failed to store reading in Milvus: {exc}")   
 
-    logger.info(f"✅ Successfully extracted meter reading: {vision_result['meter_value']} at {full_address}")
+    logger.info("✅ Successfully extracted meter reading: %s at %s", vision_result['meter_value'], address.full_address)
         
-    # Return successful response
-    return UploadResponse(
+    # Values are already validated, so skip model validation and serialize straight to orjson
+    return ORJSONResponse(UploadResponse.model_construct(
         success=True,
         reading_id=reading_id,
         meter_value=vision_result["meter_value"],
         confidence=vision_result["confidence"],
-        address=full_address,
-        timestamp=datetime.now(),
+        address=address.full_address,
+        timestamp=datetime.fromtimestamp(reading_ulid.timestamp),
         notes=vision_result.get("notes", "")
-    )
+    ).model_dump())
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
         query: ChatQuery,
         milvus_service = Depends(get_milvus_service),
         bedrock_service = Depends(get_bedrock_service)
-    ) -> ChatResponse:
+    ) -> ORJSONResponse:
     """
         Chat with meter data using semantic search
     """
@@ -193,70 +278,79 @@ async def chat(
         raise HTTPException(status_code=503, detail="milvus service not available")
     
     # Determine search strategy based on query
-    context_results = []
-    user_query_lower = user_query.lower()
+    strategy = next((name for name, pattern in CHAT_ROUTES if pattern.search(user_query)), "general")
 
     # Check for time-based queries
-    if any(word in user_query_lower for word in ["last", "latest", "recent", "newest", "most recent"]):
-        context_results = await search_by_recency(milvus_service, user_query, limit=5)
-        logger.info(f"Using recency search for query: {user_query}")
+    if strategy == "recency":
+        primary_search = search_by_recency(milvus_service, user_query, limit=5)
+        logger.info("Using recency search for query: %s", user_query)
         
     # Check for usage-related queries
-    elif any(word in user_query_lower for word in ["usage", "high", "low", "consumption", "similar", "pattern", "highest", "lowest"]):
-        context_results = await search_by_context(milvus_service, bedrock_service, user_query, limit=5)
-        logger.info(f"Using context search for query: {user_query}")
+    elif strategy == "context":
+        primary_search = search_by_context(milvus_service, bedrock_service, user_query, limit=5)
+        logger.info("Using context search for query: %s", user_query)
         
     # Check for location-based queries
-    elif any(word in user_query_lower for word in ["address", "street", "city", "location", "where", "at"]):
-        context_results = await search_by_address(milvus_service, bedrock_service, user_query, limit=5)
-        logger.info(f"Using address search for query: {user_query}")
+    elif strategy == "address":
+        primary_search = search_by_address(milvus_service, bedrock_service, user_query, limit=5)
+        logger.info("Using address search for query: %s", user_query)
         
-    # Default: Use general similarity search from bedrock_service
+    # Default: general similarity search on combined embeddings, run together with the address fallback
     else:
-        context_results = await search_similar_readings(
-            milvus_service, 
-            bedrock_service,
-            user_query, 
-            search_type="combined",  # Search combined embeddings for general queries
-            limit=5
+        primary_search = None
+        logger.info("Using general similarity search for query: %s", user_query)
+    
+    # Run the address fallback alongside the primary search instead of one after another on a miss
+    if primary_search is None:
+        similar_results = await search_both(milvus_service, bedrock_service, user_query, limit=10)
+        context_results, address_results = similar_results["combined"][:5], similar_results["address"]
+
+    else:
+        context_results, address_results = await asyncio.gather(
+            primary_search,
+            search_similar_readings(
+                milvus_service,
+                bedrock_service,
+                user_query, 
+                search_type="address",  # Try address-only search as fallback
+                limit=10
+            )
         )
-        logger.info(f"Using general similarity search for query: {user_query}")
     
-    # If no results found, try broader search
+    # If no results found, use broader search
     if not context_results:
-        logger.warning(f"No results found for query '{user_query}', trying broader search")
-        context_results = await search_similar_readings(
-            milvus_service,
-            bedrock_service,
-            user_query, 
-            search_type="address",  # Try address-only search as fallback
-            limit=10
-        )
+        logger.warning("No results found for query '%s', using broader search", user_query)
+        context_results = address_results
     
-    # If still no results, get recent readings as context
+    # If still no results, use recent readings as context
     if not context_results:
         logger.warning("No similar results found, using recent readings as context")
         context_results = await search_by_recency(milvus_service, "", limit=5)
     
     # Log search results for debugging
-    logger.info(f"Found {len(context_results)} context results for chat query")
-    for i, result in enumerate(context_results[:3]):  # Log first 3 results
-        logger.info(f"Result {i+1}: {result.get('full_address')} - {result.get('meter_value')} (similarity: {result.get('similarity_score', 'N/A')})")
+    logger.info("Found %d context results for chat query", len(context_results))
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, result in enumerate(context_results[:3]):  # Log first 3 results
+            logger.debug(
+                "Result %d: %s - %s (similarity: %s)",
+                i + 1, result.get('full_address'), result.get('meter_value'), result.get('similarity_score', 'N/A')
+            )
     
     
     # Generate response using Bedrock
     response_text = await bedrock_service.generate_chat_response(user_query, context_results)
     
-    return ChatResponse(
+    return ORJSONResponse(ChatResponse.model_construct(
         response=response_text,
         sources_count=len(context_results)
-    )
+    ).model_dump())
 
-@router.get("/readings")
+@router.get("/readings", response_model=None)
 async def get_readings_with_vectors(
         limit: int = 20, 
+        include_samples: bool = False,
         milvus_service = Depends(get_milvus_service),
-    ) -> dict:
+    ) -> StreamingResponse:
     """
         Get readings including vector field info
     """
@@ -264,38 +358,61 @@ async def get_readings_with_vectors(
     if not milvus_service.collection:
             raise HTTPException(status_code=503, detail="Milvus not available")
 
+    # Embeddings are only fetched when samples are explicitly requested
+    output_fields = ["id", "meter_value", "full_address", "confidence"]
+
+    if include_samples:
+        output_fields += ["address_embedding", "combined_embedding"]
+
     try:
-        milvus_service.collection.load()
-        
-        results = milvus_service.collection.query(
+        # pymilvus is synchronous; creating the iterator already issues an RPC
+        iterator = await asyncio.to_thread(
+            milvus_service.collection.query_iterator,
+            batch_size=READINGS_BATCH_SIZE,
+            limit=limit,
             expr="id != ''",
-            output_fields=["id", "meter_value", "full_address", "confidence", "address_embedding", "combined_embedding"],
-            limit=limit
+            output_fields=output_fields
         )
     
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
     
-    serializable_results = []
-
-    for result in results:
-        converted = convert_milvus_result(result)
-        # Add vector info without showing full arrays
-        converted["address_embedding_length"] = len(converted.get("address_embedding", []))
-        converted["combined_embedding_length"] = len(converted.get("combined_embedding", []))
-        converted["address_embedding_sample"] = converted.get("address_embedding", [])[:5]
-        converted["combined_embedding_sample"] = converted.get("combined_embedding", [])[:5]
-        # Remove full vectors to keep response small
-        converted.pop("address_embedding", None)
-        converted.pop("combined_embedding", None)
-        serializable_results.append(converted)
-    
-    return {
-        "readings": serializable_results, 
-        "count": len(serializable_results)
-    }
-        
-    
+    return StreamingResponse(stream_readings(iterator, include_samples), media_type="application/json")
+
+async def stream_readings(iterator, include_samples: bool) -> AsyncIterator[bytes]:
+    """
+        Stream readings as a JSON document, one Milvus batch at a time
+    """
+
+    count = 0
+    error = None
+
+    yield b'{"readings":['
+
+    try:
+        while batch := await asyncio.to_thread(iterator.next):
+            for result in batch:
+                result["address_embedding_length"] = EMBEDDING_DIM
+                result["combined_embedding_length"] = EMBEDDING_DIM
+
+                if include_samples:
+                    result["address_embedding_sample"] = as_vector(result.pop("address_embedding", []))[:5]
+                    result["combined_embedding_sample"] = as_vector(result.pop("combined_embedding", []))[:5]
+
+                yield (b"," if count else b"") + orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY)
+                count += 1
+
+    except Exception as exc:
+        logger.error("❌ Streaming readings failed after %d rows: %s", count, exc)
+        error = f"Streaming stopped after {count} rows: {str(exc)}"
+
+    finally:
+        iterator.close()
+
+    # The 200 status is already sent, so a truncated listing is flagged in the closing fragment
+    closing = b'],"count":' + str(count).encode()
 
+    if error is not None:
+        closing += b',"error":' + orjson.dumps(error)
 
-    
\ No newline at end of file
+    yield closing + b"}"
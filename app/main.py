@@ -2,37 +2,46 @@
     FastAPI entrypoint
 """
 
+import os
+import asyncio
 import uvicorn
 import logging
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+# Service modules read their settings at import time, so .env must be loaded first
+load_dotenv()
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse
 
-from api.routes import router
-from api.dependencies import bedrock_service, milvus_service
+from api.routes import router, build_root_response
+from api.dependencies import get_bedrock_service, get_milvus_service, MAX_REQUEST_SIZE
 
 
-load_dotenv()
-
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(
-    title="Water Meter Scanner",
-    description="A web application for scanning home water usage counters"
-)
-
-app.include_router(router)
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-@app.on_event("startup")
-async def startup_event():
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     """
-        Initialize services on startup
+        Initialize services on startup and release them on shutdown
     """
 
     logger.info("Starting Water Meter Scanner application...")
+
+    # Blocking pymilvus calls run via asyncio.to_thread, which uses the default executor
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=int(os.getenv("APP_THREAD_POOL_SIZE", "64")))
+    )
+
+    milvus_service = get_milvus_service()
+    bedrock_service = get_bedrock_service()
+
+    # Resolve the web interface once instead of checking the filesystem per request
+    app.state.root_response = build_root_response()
     
     # Initialize Milvus with error handling
     try:
@@ -61,6 +70,51 @@ async def startup_event():
         logger.error(f"❌ Bedrock initialization error: {str(exc)}")
         logger.info("Application will continue without Bedrock functionality")
 
+    yield
+
+    await bedrock_service.close()
+    await milvus_service.close()
+
+class RejectOversizedRequests:
+    """
+        Reject oversized uploads by Content-Length before the multipart body is read
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        # Plain ASGI, so other requests pass straight through without a BaseHTTPMiddleware wrapper
+        if scope["type"] == "http":
+            content_length = dict(scope["headers"]).get(b"content-length", b"")
+
+            if content_length.isdigit() and int(content_length) > MAX_REQUEST_SIZE:
+                response = ORJSONResponse(status_code=413, content={"detail": "File too large"})
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
+
+app = FastAPI(
+    title="Water Meter Scanner",
+    description="A web application for scanning home water usage counters",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+app.include_router(router)
+app.mount("/static", StaticFiles(directory="static"), name="static")
+app.add_middleware(RejectOversizedRequests)
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Each worker runs its own lifespan, so services, caches, batchers and index management are per-process;
+    # raise APP_WORKERS only behind a setup where that duplication is acceptable
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("APP_WORKERS", "1"))
+    )
 
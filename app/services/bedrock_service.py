@@ -6,16 +6,173 @@ import os
 import re
 import io
 import json
-import boto3
 import base64
+import hashlib
+import asyncio
 import logging
+import weakref
+import textwrap
+import unicodedata
+import aioboto3
+import aiofiles
+import orjson
+import numpy as np
 
 from fastapi import HTTPException
+from aiobotocore.config import AioConfig
+from cachetools import TTLCache
+from contextlib import AsyncExitStack
+
+from models.schemas import MeterAddress
+from services.image_preproc import downscale_image, enhance_image, MAX_VISION_DIMENSION, JPEG_QUALITY
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Caps in-flight Bedrock calls so bursts don't trip model TPS quotas
+BEDROCK_MAX_CONCURRENCY = int(os.getenv("BEDROCK_MAX_CONCURRENCY", "16"))
+
+# HTTPS pool sized above the concurrency cap so calls never queue for a connection
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "64"))
+
+# Calls still running after these delays get a duplicate request raced against them (0 disables)
+BEDROCK_EMBED_HEDGE_DELAY = float(os.getenv("BEDROCK_EMBED_HEDGE_DELAY_MS", "500")) / 1000
+BEDROCK_VISION_HEDGE_DELAY = float(os.getenv("BEDROCK_VISION_HEDGE_DELAY_MS", "8000")) / 1000
+BEDROCK_HEDGE_BUDGET = 0.05
+
+# Opt-in: images uploaded within this window are analyzed together in one vision request.
+# Batches mix different users' photos in one prompt, so the default of 1 keeps every image in its own request
+VISION_BATCH_WINDOW = float(os.getenv("BEDROCK_VISION_BATCH_WINDOW_MS", "20")) / 1000
+VISION_BATCH_MAX_SIZE = int(os.getenv("BEDROCK_VISION_BATCH_SIZE", "1"))
+
+# Optional preprocessing enhancement factors (1.0 disables a step)
+PREPROCESS_CONTRAST = float(os.getenv("PREPROCESS_CONTRAST", "1.2"))
+PREPROCESS_SHARPNESS = float(os.getenv("PREPROCESS_SHARPNESS", "1.1"))
+
+# Re-uploads of identical image bytes reuse the earlier analysis
+VISION_CACHE_SIZE = 10_000
+VISION_CACHE_TTL = 24 * 60 * 60
+
+EMBED_CACHE_SIZE = 10_000
+EMBED_CACHE_TTL = 7 * 24 * 60 * 60
+
+# Address and query normalization for embedding cache keys
+ADDRESS_PUNCTUATION = str.maketrans({char: " " for char in ".,;:'\"#()-/"})
+ADDRESS_ABBREVIATIONS = {
+    "st": "street",
+    "str": "street",
+    "rd": "road",
+    "ave": "avenue",
+    "av": "avenue",
+    "blvd": "boulevard",
+    "ln": "lane",
+    "dr": "drive",
+    "ct": "court",
+    "pl": "place",
+    "sq": "square",
+    "hwy": "highway",
+    "apt": "apartment",
+}
+
+JSON_DECODER = json.JSONDecoder()
+
+# Vision response cleanup and fallback extraction patterns
+LEADING_ZEROS_RE = re.compile(r':\s*0+(\d+)')
+METER_VALUE_RE = re.compile(r'meter[_\s]*value["\s]*:?\s*([0-9]+\.?[0-9]*)', re.IGNORECASE)
+VALUE_PATTERNS = (
+    r'(?P<unit>\d+\.?\d*)\s*(?:cubic|liters|gallons|m3|m³)',
+    r'reading[:\s]+(?P<reading>\d+\.?\d*)',
+    r'value[:\s]+(?P<value>\d+\.?\d*)',
+    r'(?P<fallback>\d{3,6}\.?\d*)'  # 3-6 digit numbers (typical meter readings)
+)
+VALUE_GROUPS = ("unit", "reading", "value", "fallback")
+FALLBACK_VALUE_RE = re.compile("|".join(VALUE_PATTERNS), re.IGNORECASE)
+
+# Serialized image data field; user text can't produce it because orjson escapes its quotes
+IMAGE_DATA_PLACEHOLDER = "__IMAGE_DATA__"
+IMAGE_DATA_FIELD = b'"data":"__IMAGE_DATA__"'
+PROMPT_FIELD = b'"text":"__PROMPT__"'
+
+# Single-image vision request serialized once; per request only the image and prompt are spliced in
+_VISION_REQUEST_HEAD, _VISION_REQUEST_REST = orjson.dumps({
+    "anthropic_version": "bedrock-2023-05-31",
+    "max_tokens": 1000,
+    "temperature": 0.1,
+    "messages": [
+        {
+            "role": "user",
+            "content": [
+                {"type": "image", "source": {"type": "base64", "media_type": "image/jpeg", "data": IMAGE_DATA_PLACEHOLDER}},
+                {"type": "text", "text": "__PROMPT__"}
+            ]
+        }
+    ]
+}).split(IMAGE_DATA_FIELD)
+_VISION_REQUEST_MIDDLE, _VISION_REQUEST_TAIL = _VISION_REQUEST_REST.split(PROMPT_FIELD)
+
+# Prompts are built once at import and dedented so indentation isn't sent as input tokens
+_VISION_PROMPT_TEMPLATE = textwrap.dedent("""
+                    You are an expert technician in water-meter reading. Carefully analyze the attached image and return ONLY the JSON specified below—no additional text.
+
+                    Address: {full_address}  
+
+                    INSTRUCTIONS:
+
+                    1. Identify meter type:
+                        - analog       - rotating pointer dials (0-9)  
+                        - digital      - full LCD/LED numeric display  
+                        - mechanical   - rolling number wheels visible through windows  
+                        - unclear      - cannot determine type confidently  
+
+                    2. Read value (left→right, largest to smallest units) and note colored digits:
+                        - Color-coding note: Digits in a different color (often red) represent the fractional part—i.e., everything right of the decimal point. Include them after “.”
+
+                    3. Type-specific rules:
+                        - analog:  Format: XXXXX.XXX (6-8 digits, with three decimals)  
+                        - digital: Transcribe all primary digits and any visible decimal places  
+                        - mechanical: Read black wheel digits only; ignore smaller digits but doesn't ignore the fractional part.
+
+                    4. Determine units (cubic_meters, gallons, or liters). If unknown, set units to null.
+
+                    5. Visibility & confidence:
+                        confidence: float 0.0-1.0 reflecting clarity  
+                        - 1.0: perfect clarity  
+                        - 0.8: minor glare/tilt  
+                        - 0.6: slight obstruction  
+                        - 0.4: partial obstruction/low contrast  
+                        - 0.2: very unclear, heavy glare/blur  
+                        - 0.0: unreadable  
+
+                    OUTPUT (strictly this JSON):
+                    {{
+                        "meter_value": "should be a float number representing the reading",
+                        "confidence": "0.0 to 1.0 based on image clarity",
+                        "meter_type": "analog|digital|mechanical|unclear",
+                        "units": "cubic_meters|gallons|liters",
+                        "notes": "Description of what you see and why you chose this reading",
+                        "reading_visible": "true|false"
+                    }}
+                    
+                    IMPORTANT: 
+                        - meter_value must be a valid number (no leading zeros like 010009129)
+                        - If you see 010009129, return it as 10009129.0
+                        - Always use decimal format (add .0 if whole number)
+                    BE VERY CAREFUL with dial positions. If a pointer is between two number - get a lower number
+                """).strip()
+
+_CHAT_PROMPT_TEMPLATE = textwrap.dedent("""
+                    You are a helpful assistant for water meter readings. Use the following data to answer questions about water usage.
+
+                    Available meter data:
+                    {context}
+
+                    User question: {query}
+
+                    Please provide a clear, helpful answer based on the available data. If the question asks for specific values, include the meter readings. 
+                    If comparing values, show the numbers clearly. If asking about locations, include the addresses.
+                """).strip()
+
 class BedrockService:
     def __init__(self):
         self.region = os.getenv("AWS_DEFAULT_REGION", "eu-west-1")
@@ -26,6 +183,29 @@ class BedrockService:
         # Initialize Bedrock client
         self.bedrock_runtime = None
         self.connected = False
+
+        # One session for the service lifetime; reconnects reuse its credential resolution
+        self._session = aioboto3.Session()
+        self._exit_stack = AsyncExitStack()
+        self._semaphore = asyncio.Semaphore(BEDROCK_MAX_CONCURRENCY)
+
+        # Hedged request budget accounting
+        self._invocations = 0
+        self._hedges = 0
+
+        # Vision results keyed by SHA-256 of the uploaded image
+        self._vision_cache = TTLCache(maxsize=VISION_CACHE_SIZE, ttl=VISION_CACHE_TTL)
+        self._vision_locks = {}
+
+        # Embeddings keyed by model and BLAKE2b of the text (or normalized address)
+        self._embed_cache = TTLCache(maxsize=EMBED_CACHE_SIZE, ttl=EMBED_CACHE_TTL)
+        self._embed_locks = weakref.WeakValueDictionary()
+        self._embed_stats = {"hits": 0, "misses": 0}
+
+        # Vision micro-batching, started in initialize()
+        self._vision_queue = None
+        self._vision_batcher_task = None
+        self._vision_tasks = set()
     
     async def connect(self) -> bool:
         """
@@ -33,20 +213,18 @@ class BedrockService:
         """
 
         try:
-            self.bedrock_runtime = boto3.client(
+            # Long-lived async client, entered once and closed on shutdown. Credentials come from the
+            # default provider chain: AWS_* env vars (including .env), shared config, or an IAM role
+            self.bedrock_runtime = await self._exit_stack.enter_async_context(self._session.client(
                 'bedrock-runtime',
                 region_name=self.region,
-                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-            )
-            
-            # Test connection by listing available models
-            _ = boto3.client(
-                'bedrock',
-                region_name=self.region,
-                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-            )            
+                config=AioConfig(
+                    max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+                    retries={"mode": "adaptive", "max_attempts": 5},
+                    connect_timeout=2,
+                    read_timeout=60
+                )
+            ))
 
             logger.info(f"✅ Connected to AWS Bedrock in {self.region}")
             
@@ -58,102 +236,243 @@ class BedrockService:
             self.connected = False
             return False
         
-    async def generate_embedding(self, text: str) -> list:
+    async def close(self) -> None:
+        """
+            Close Bedrock runtime client
+        """
+
+        if self._vision_batcher_task:
+            self._vision_batcher_task.cancel()
+
+        for task in self._vision_tasks:
+            task.cancel()
+
+        # Uploads still waiting in the queue fail instead of hanging forever
+        while self._vision_queue and not self._vision_queue.empty():
+            _, _, future = self._vision_queue.get_nowait()
+
+            if not future.done():
+                future.set_exception(RuntimeError("Bedrock service closed"))
+
+        self._vision_queue = None
+        self._vision_batcher_task = None
+        self._vision_tasks = set()
+
+        await self._exit_stack.aclose()
+
+        self.bedrock_runtime = None
+        self.connected = False
+
+    async def _invoke_model(self, model_id: str, body: bytes, hedge_delay: float | None = None) -> dict:
+        """
+            Invoke a Bedrock model and return the parsed response body, optionally hedging slow calls
+        """
+
+        self._invocations += 1
+
+        primary = asyncio.create_task(self._invoke_once(model_id, body))
+        tasks = {primary}
+
+        try:
+            if hedge_delay:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+
+                # Race a duplicate request against a slow one, capped to a small share of all calls
+                if not done and self._hedges < self._invocations * BEDROCK_HEDGE_BUDGET:
+                    self._hedges += 1
+                    logger.info(f"Hedging {model_id} call after {hedge_delay}s ({self._hedges}/{self._invocations})")
+                    tasks.add(asyncio.create_task(self._invoke_once(model_id, body)))
+
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+
+            # Every attempt failed; surface the original error
+            return primary.result()
+
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _invoke_once(self, model_id: str, body: bytes) -> dict:
         """
-            Generate embedding
+            Single Bedrock invocation under the concurrency cap
+        """
+
+        async with self._semaphore:
+            response = await self.bedrock_runtime.invoke_model(
+                modelId=model_id,
+                body=body
+            )
+
+            async with response['body'] as stream:
+                return orjson.loads(await stream.read())
+
+    async def generate_embedding(self, text: str, cache_key: str | None = None) -> np.ndarray:
+        """
+            Generate embedding, cached per (model, text) or per explicit cache key
         """
 
         if not self.connected:
             raise HTTPException(status_code=503, detail="bedrock service not available")
-            
+
+        key = (self.embed_model, hashlib.blake2b((cache_key or text).encode(), digest_size=16).digest())
+
+        # Vectors are cached as float16 to halve memory; callers always get float32
+        cached = self._embed_cache.get(key)
+
+        if cached is not None:
+            self._embed_stats["hits"] += 1
+            return cached.astype(np.float32)
+
+        # Single-flight: concurrent requests for the same text wait for one Bedrock call
+        lock = self._embed_locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            cached = self._embed_cache.get(key)
+
+            if cached is not None:
+                self._embed_stats["hits"] += 1
+                return cached.astype(np.float32)
+
+            self._embed_stats["misses"] += 1
+            quantized = (await self._fetch_embedding(text)).astype(np.float16)
+            self._embed_cache[key] = quantized
+
+        # Misses return the same rounded vector a later hit would, so results don't depend on cache state
+        return quantized.astype(np.float32)
+
+    def get_embed_cache_stats(self) -> dict:
+        """
+            Embedding cache hit/miss counters and current size
+        """
+
+        lookups = self._embed_stats["hits"] + self._embed_stats["misses"]
+
+        return {
+            **self._embed_stats,
+            "size": len(self._embed_cache),
+            "max_size": EMBED_CACHE_SIZE,
+            "ttl_seconds": EMBED_CACHE_TTL,
+            "hit_rate": self._embed_stats["hits"] / lookups if lookups else 0.0
+        }
+
+    async def _fetch_embedding(self, text: str) -> np.ndarray:
+        """
+            Request embedding from Bedrock
+        """
+
+        # Unit-normalized vectors let Milvus use inner product (cosine) with SQ8 indexes
         request_body = {
-            "inputText": text
+            "inputText": text,
+            "normalize": True
         }
 
         try:  
-            response = self.bedrock_runtime.invoke_model(
-                modelId=self.embed_model,
-                body=json.dumps(request_body)
-            )
+            response_body = await self._invoke_model(self.embed_model, orjson.dumps(request_body), BEDROCK_EMBED_HEDGE_DELAY)
 
         except Exception as exc:
             logger.error(f"❌ Embedding generation failed: {str(exc)}")
             raise
             
-        response_body = json.loads(response['body'].read())
-        embedding = response_body.get('embedding', [])
+        # Contiguous float32 lets pymilvus serialize the buffer without another conversion
+        embedding = np.ascontiguousarray(response_body.get('embedding', []), dtype=np.float32)
         
-        if not embedding:
+        if not embedding.size:
             raise ValueError("No embedding returned from Bedrock")
         
         logger.info(f"✅ Generated embedding for text: {text[:50]}...")
         return embedding
             
-    async def generate_meter_embeddings(self, address_info: dict, meter_value: float, units: str) -> dict:
+    async def generate_address_embedding(self, address: MeterAddress) -> np.ndarray:
         """
-            Generate both address and combined embeddings for meter reading
+            Generate address embedding (independent of the meter reading)
         """
-        
-        # Create address text
-        full_address = f"{address_info.get('street_number', '')} {address_info.get('street_name', '')}, {address_info.get('city', '')}"
-        
-        # Create combined context text
-        combined_text = f"Water meter at {full_address} reading {meter_value} {units}"
-        
-        # Generate both embeddings
-        address_embedding = await self.generate_embedding(full_address)
-        combined_embedding = await self.generate_embedding(combined_text)
-        
-        return {
-            "address_embedding": address_embedding,
-            "combined_embedding": combined_embedding,
-            "full_address": full_address
-        }
-            
+
+        # Formatting variants of the same address share one cached embedding
+        normalized = "|".join(self._normalize_address(address.city, address.street_name, address.street_number))
+
+        return await self.generate_embedding(address.full_address, cache_key=f"address|{normalized}")
+
+    def _normalize_address(self, city: str, street_name: str, street_number: str) -> tuple:
+        """
+            Canonical address parts, so "123 Main St" and "123 main street" share one cache entry
+        """
+
+        return self._normalize_text(city), self._normalize_text(street_name), self._normalize_text(street_number)
+
+    @staticmethod
+    def _normalize_text(text: str) -> str:
+        """
+            Casefolded words without punctuation, with street abbreviations expanded
+        """
+
+        text = unicodedata.normalize("NFKD", text).casefold().translate(ADDRESS_PUNCTUATION)
+        return " ".join(ADDRESS_ABBREVIATIONS.get(word, word) for word in text.split())
+
+    async def generate_query_embedding(self, query: str) -> np.ndarray:
+        """
+            Generate embedding for a search query, shared by queries with the same normalized tokens
+        """
+
+        # Only exact token matches share an embedding: "Main St." and "main street" do, "Maine street" doesn't
+        return await self.generate_embedding(query, cache_key=f"query|{self._normalize_text(query)}")
+
+    async def generate_value_embedding(self, address: MeterAddress, meter_value: float, units: str) -> np.ndarray:
+        """
+            Generate combined address + reading context embedding
+        """
+
+        combined_text = f"Water meter at {address.full_address} reading {meter_value} {units}"
+
+        return await self.generate_embedding(combined_text)
+
     def _preprocess_image(self, image_bytes: bytes) -> bytes:
         """
             Enhance image quality for better OCR results
         """
 
-        from PIL import Image, ImageEnhance
+        from PIL import Image
         
         try:
             image = Image.open(io.BytesIO(image_bytes))
+
+            # Vision requests declare JPEG, so anything else must be re-encoded
+            modified = image.format != 'JPEG'
             
             # Convert to RGB if needed
             if image.mode != 'RGB':
                 image = image.convert('RGB')
+                modified = True
             
-            # Resize if too large (max 1024x1024 for faster processing)
-            max_size = 1024
+            # Resize if too large
+            max_size = MAX_VISION_DIMENSION
             if image.width > max_size or image.height > max_size:
                 image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+                modified = True
             
-            # Enhance contrast
-            contrast_enhancer = ImageEnhance.Contrast(image)
-            image = contrast_enhancer.enhance(1.2)
-            
-            # Enhance sharpness
-            sharpness_enhancer = ImageEnhance.Sharpness(image)
-            image = sharpness_enhancer.enhance(1.1)
+            # Enhance contrast and sharpness
+            if PREPROCESS_CONTRAST != 1.0 or PREPROCESS_SHARPNESS != 1.0:
+                image = enhance_image(image, contrast=PREPROCESS_CONTRAST, sharpness=PREPROCESS_SHARPNESS)
+                modified = True
+
+            # Nothing changed, so skip the JPEG re-encode
+            if not modified:
+                return image_bytes
             
             # Save back to bytes
             output = io.BytesIO()
-            image.save(output, format='JPEG', quality=95)
+            image.save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True)
             return output.getvalue()
             
         except Exception as exc:
             logger.warning(f"Image preprocessing failed: {str(exc)}, using original image")
             return image_bytes
     
-    def _encode_image(self, image_bytes: bytes) -> str:
-        """
-            Encode image bytes to base64 string
-        """
-
-        return base64.b64encode(image_bytes).decode('utf-8')
-    
-    async def analyze_meter_image(self, image_bytes: bytes, address_info: dict, preprocess: bool = False) -> dict:
+    async def analyze_meter_image(self, image_path: str, address: MeterAddress, preprocess: bool = False) -> dict:
         """
             Analyze water meter image using vision model to extract meter reading
         """
@@ -161,143 +480,309 @@ class BedrockService:
         if not self.connected:
             raise HTTPException(status_code=503, detail="bedrock service not available")
 
+        async with aiofiles.open(image_path, "rb") as image_file:
+            image_bytes = await image_file.read()
+
+        cache_key = (hashlib.sha256(image_bytes).digest(), preprocess)
+
+        cached = self._vision_cache.get(cache_key)
+
+        if cached is not None:
+            logger.info("♻️ Vision result served from cache")
+            return {**cached, "address": address.full_address}
+
+        # Single-flight: concurrent uploads of the same image wait for one Bedrock call
+        lock = self._vision_locks.setdefault(cache_key, asyncio.Lock())
+
+        try:
+            async with lock:
+                cached = self._vision_cache.get(cache_key)
+
+                if cached is not None:
+                    return {**cached, "address": address.full_address}
+
+                result = await self._analyze_image_bytes(image_bytes, address, preprocess)
+
+                # Only cache cleanly parsed results, so failures are retried
+                if "error" not in result and "raw_response" not in result:
+                    self._vision_cache[cache_key] = result
+
+                return result
+
+        finally:
+            self._vision_locks.pop(cache_key, None)
+
+    async def _analyze_image_bytes(self, image_bytes: bytes, address: MeterAddress, preprocess: bool) -> dict:
+        """
+            Downscale, optionally preprocess and analyze raw image bytes
+        """
+
+        # Shrink large camera photos before they are base64-encoded and sent over the wire
+        image_bytes = await asyncio.to_thread(downscale_image, image_bytes)
+
         # Preprocess image for better recognition
         if preprocess:
-            image_bytes = self._preprocess_image(image_bytes)
+            image_bytes = await asyncio.to_thread(self._preprocess_image, image_bytes)
+
+        if self._vision_queue is None:
+            return await self._analyze_single(image_bytes, address)
+
+        # Coalesce with images uploaded concurrently into one Bedrock call
+        future = asyncio.get_running_loop().create_future()
+        await self._vision_queue.put((image_bytes, address, future))
+
+        return await future
+
+    async def _vision_batcher(self) -> None:
+        """
+            Drain queued images for up to VISION_BATCH_WINDOW and analyze them in batches
+        """
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._vision_queue.get()]
+            deadline = loop.time() + VISION_BATCH_WINDOW
+
+            try:
+                while len(batch) < VISION_BATCH_MAX_SIZE:
+                    timeout = deadline - loop.time()
+
+                    if timeout <= 0:
+                        break
+
+                    try:
+                        batch.append(await asyncio.wait_for(self._vision_queue.get(), timeout))
+
+                    except asyncio.TimeoutError:
+                        break
+
+            except asyncio.CancelledError:
+                self._fail_vision_batch(batch, RuntimeError("Bedrock service closed"))
+                raise
+
+            # Don't wait for this batch before collecting the next one
+            task = asyncio.create_task(self._resolve_vision_batch(batch))
+            self._vision_tasks.add(task)
+            task.add_done_callback(self._vision_tasks.discard)
+
+    def _fail_vision_batch(self, batch: list, exc: Exception) -> None:
+        """
+            Fail every still-pending future of a vision batch
+        """
+
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(exc)
+
+    async def _resolve_vision_batch(self, batch: list) -> None:
+        """
+            Analyze a batch of queued images and resolve their futures
+        """
+
+        items = [(image_bytes, address) for image_bytes, address, _ in batch]
+
+        try:
+            if len(items) == 1:
+                results = [await self._analyze_single(*items[0])]
+
+            else:
+                results = await self._analyze_batch(items)
+
+        except asyncio.CancelledError:
+            self._fail_vision_batch(batch, RuntimeError("Bedrock service closed"))
+            raise
+
+        except Exception as exc:
+            self._fail_vision_batch(batch, exc)
+            return
+
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
 
-        # Encode image
-        image_base64 = self._encode_image(image_bytes)
+    async def _analyze_single(self, image_bytes: bytes, address: MeterAddress) -> dict:
+        """
+            Analyze one meter image in its own Bedrock request
+        """
+
+        full_address = address.full_address
+
+        request_body = await asyncio.to_thread(self._single_vision_request_body, image_bytes, self._vision_prompt(full_address))
+
+        try:
+            response_body = await self._invoke_model(self.vision_model, request_body, BEDROCK_VISION_HEDGE_DELAY)
         
-        # Create structured prompt for meter reading extraction
-        full_address = f"{address_info.get('street_number', '')} {address_info.get('street_name', '')}, {address_info.get('city', '')}"
+        except Exception as exc:
+            logger.error(f"❌ Vision analysis failed: {str(exc)}")
+            return self._vision_failure(exc, full_address)
+            
+        content = response_body['content'][0]['text']
         
-        prompt = f"""
-                    You are an expert technician in water-meter reading. Carefully analyze the attached image and return ONLY the JSON specified below—no additional text.
+        logger.info(f"Vision model response: {content}")
 
-                    Address: {full_address}  
+        return self._parse_vision_response(content, full_address)
 
-                    INSTRUCTIONS:
+    async def _analyze_batch(self, items: list) -> list:
+        """
+            Analyze several meter images in one Bedrock request, one JSON object per image
+        """
 
-                    1. Identify meter type:
-                        - analog       - rotating pointer dials (0-9)  
-                        - digital      - full LCD/LED numeric display  
-                        - mechanical   - rolling number wheels visible through windows  
-                        - unclear      - cannot determine type confidently  
+        address_text = "\n".join(f"Image {i}: {address.full_address}" for i, (_, address) in enumerate(items, 1))
+        content = []
+
+        for i in range(1, len(items) + 1):
+            content.append({"type": "text", "text": f"Image {i}:"})
+            content.append(self._image_block())
+
+        prompt = (
+            f"You are given {len(items)} water meter images labelled Image 1 to Image {len(items)}. "
+            f"Analyze each image independently using the instructions below and return ONLY a JSON array "
+            f"with exactly {len(items)} objects, each in the OUTPUT format plus an \"image\" field holding "
+            f"the number of the image it describes.\n"
+            + self._vision_prompt(address_text)
+        )
+        content.append({"type": "text", "text": prompt})
+
+        request_body = await asyncio.to_thread(
+            self._vision_request_body,
+            content,
+            [image_bytes for image_bytes, _ in items],
+            1000 * len(items)
+        )
 
-                    2. Read value (left→right, largest to smallest units) and note colored digits:
-                        - Color-coding note: Digits in a different color (often red) represent the fractional part—i.e., everything right of the decimal point. Include them after “.”
+        try:
+            response_body = await self._invoke_model(self.vision_model, request_body, BEDROCK_VISION_HEDGE_DELAY)
+            response_text = response_body['content'][0]['text']
 
-                    3. Type-specific rules:
-                        - analog:  Format: XXXXX.XXX (6-8 digits, with three decimals)  
-                        - digital: Transcribe all primary digits and any visible decimal places  
-                        - mechanical: Read black wheel digits only; ignore smaller digits but doesn't ignore the fractional part.
+            logger.info(f"Vision model batch response: {response_text}")
 
-                    4. Determine units (cubic_meters, gallons, or liters). If unknown, set units to null.
+            json_results = self._decode_json_at(response_text, '[')
 
-                    5. Visibility & confidence:
-                        confidence: float 0.0-1.0 reflecting clarity  
-                        - 1.0: perfect clarity  
-                        - 0.8: minor glare/tilt  
-                        - 0.6: slight obstruction  
-                        - 0.4: partial obstruction/low contrast  
-                        - 0.2: very unclear, heavy glare/blur  
-                        - 0.0: unreadable  
+            # Results are matched to images by their "image" label, never by position
+            by_image = {
+                item.pop("image"): item
+                for item in json_results
+                if isinstance(item, dict) and isinstance(item.get("image"), int)
+            }
 
-                    OUTPUT (strictly this JSON):
-                    {{
-                        "meter_value": "should be a float number representing the reading",
-                        "confidence": "0.0 to 1.0 based on image clarity",
-                        "meter_type": "analog|digital|mechanical|unclear",
-                        "units": "cubic_meters|gallons|liters",
-                        "notes": "Description of what you see and why you chose this reading",
-                        "reading_visible": "true|false"
-                    }}
-                    
-                    IMPORTANT: 
-                        - meter_value must be a valid number (no leading zeros like 010009129)
-                        - If you see 010009129, return it as 10009129.0
-                        - Always use decimal format (add .0 if whole number)
-                    BE VERY CAREFUL with dial positions. If a pointer is between two number - get a lower number
-                """
+            if len(json_results) != len(items) or sorted(by_image) != list(range(1, len(items) + 1)):
+                raise ValueError(f"Expected results labelled 1..{len(items)}, got {sorted(by_image)}")
 
-        # Prepare request body for vision model
-        request_body = {
+            # Finalized inside the try, so one malformed item falls back instead of failing the whole batch
+            results = [
+                self._finalize_vision_result(by_image[i], "", address.full_address)
+                for i, (_, address) in enumerate(items, 1)
+            ]
+
+        except Exception as exc:
+            logger.warning(f"Batched vision analysis failed: {str(exc)}, analyzing images individually")
+            return await asyncio.gather(*(self._analyze_single(image_bytes, address) for image_bytes, address in items))
+
+        logger.info(f"✅ Analyzed {len(items)} meter images in one request")
+
+        return results
+
+    def _vision_prompt(self, address_text: str) -> str:
+        """
+            Structured prompt for meter reading extraction
+        """
+
+        return _VISION_PROMPT_TEMPLATE.format_map({"full_address": address_text})
+
+    def _image_block(self) -> dict:
+        """
+            Vision request content block; image data is spliced in by _vision_request_body
+        """
+
+        return {
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": "image/jpeg",
+                "data": IMAGE_DATA_PLACEHOLDER
+            }
+        }
+
+    def _single_vision_request_body(self, image_bytes: bytes, prompt: str) -> bytes:
+        """
+            Single-image vision request body built from the pre-serialized template
+        """
+
+        return b"".join((
+            _VISION_REQUEST_HEAD,
+            b'"data":"', base64.b64encode(image_bytes), b'"',
+            _VISION_REQUEST_MIDDLE,
+            b'"text":', orjson.dumps(prompt),
+            _VISION_REQUEST_TAIL
+        ))
+
+    def _vision_request_body(self, content: list, images: list[bytes], max_tokens: int) -> bytes:
+        """
+            Serialized request body for vision model, with base64 images spliced in as raw bytes
+        """
+
+        body = orjson.dumps({
             "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 1000,
+            "max_tokens": max_tokens,
             "temperature": 0.1,
             "messages": [
                 {
                     "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/jpeg",
-                                "data": image_base64
-                            }
-                        },
-                        {
-                            "type": "text",
-                            "text": prompt
-                        }
-                    ]
+                    "content": content
                 }
             ]
+        })
+
+        # Base64 needs no JSON escaping, so the encoder never has to scan the image payload
+        parts = body.split(IMAGE_DATA_FIELD)
+        chunks = [parts[0]]
+
+        for image_bytes, part in zip(images, parts[1:]):
+            chunks += (b'"data":"', base64.b64encode(image_bytes), b'"', part)
+
+        return b"".join(chunks)
+
+    def _vision_failure(self, exc: Exception, full_address: str) -> dict:
+        """
+            Result returned when the vision call itself fails
+        """
+
+        return {
+            "meter_value": 0.0,
+            "confidence": 0.0,
+            "meter_type": "unknown",
+            "units": "unknown", 
+            "notes": f"Analysis failed: {str(exc)}",
+            "reading_visible": False,
+            "address": full_address,
+            "model_used": self.vision_model,
+            "error": str(exc)
         }
 
+    def _decode_json_at(self, text: str, opener: str):
+        """
+            Decode the first JSON value starting at opener, stripping leading zeros only if needed
+        """
+
         try:
-            response = self.bedrock_runtime.invoke_model(
-                modelId=self.vision_model,
-                body=json.dumps(request_body)
-            )
-        
-        except Exception as exc:
-            logger.error(f"❌ Vision analysis failed: {str(exc)}")
-            return {
-                "meter_value": 0.0,
-                "confidence": 0.0,
-                "meter_type": "unknown",
-                "units": "unknown", 
-                "notes": f"Analysis failed: {str(exc)}",
-                "reading_visible": False,
-                "address": address_info,
-                "model_used": self.vision_model,
-                "error": str(exc)
-            }
-            
-        response_body = json.loads(response['body'].read())
-        content = response_body['content'][0]['text']
+            return JSON_DECODER.raw_decode(text, text.index(opener))[0]
+
+        except json.JSONDecodeError:
+            # Numbers like 010009129 are invalid JSON; rewrite them only on this failure path
+            text = LEADING_ZEROS_RE.sub(r': \1', text)
+            return JSON_DECODER.raw_decode(text, text.index(opener))[0]
+
+    def _parse_vision_response(self, content: str, full_address: str) -> dict:
+        """
+            Extract meter reading JSON from vision model response text
+        """
+
         content_cleaned = content.strip()
         
-        logger.info(f"Vision model response: {content}")
-        
-        # Extract JSON from response
-        # Clean the response text
-        content_cleaned = re.sub(r':\s*0+(\d+)', r': \1', content_cleaned)
-        
-        # Try multiple strategies to find JSON
-        json_result = None
-            
+        # Parse the first JSON object in the response; trailing text or code fences are ignored
         try:
-            # Strategy 1: Look for JSON block markers
-            if "```json" in content_cleaned:
-                start_idx = content_cleaned.find("```json") + 7
-                end_idx = content_cleaned.find("```", start_idx)
-                if end_idx != -1:
-                    json_str = content_cleaned[start_idx:end_idx].strip()
-                    json_result = json.loads(json_str)
-            
-            # Strategy 2: Find JSON braces
-            elif '{' in content_cleaned and '}' in content_cleaned:
-                start_idx = content_cleaned.find('{')
-                end_idx = content_cleaned.rfind('}') + 1
-                json_str = content_cleaned[start_idx:end_idx]
-                json_result = json.loads(json_str)
-            
-            # Strategy 3: Try parsing entire response
-            else:
-                json_result = json.loads(content_cleaned)
+            json_result = self._decode_json_at(content_cleaned, '{')
             
             if not json_result:
                 raise ValueError("No valid JSON found in response")
@@ -310,20 +795,17 @@ class BedrockService:
             meter_value = 0.0
             confidence = 0.0
             
-            # Look for numeric values in the response
-            value_patterns = [
-                r'(\d+\.?\d*)\s*(?:cubic|liters|gallons|m3|m³)',
-                r'reading[:\s]+(\d+\.?\d*)',
-                r'value[:\s]+(\d+\.?\d*)',
-                r'(\d{3,6}\.?\d*)'  # 3-6 digit numbers (typical meter readings)
-            ]
-            
-            for pattern in value_patterns:
-                match = re.search(pattern, content, re.IGNORECASE)
-                if match:
-                    meter_value = float(match.group(1))
-                    confidence = 0.7  # Medium confidence for regex extraction
-                    break
+            # Scan once for all patterns, then honour their priority order
+            matches = {}
+
+            for match in FALLBACK_VALUE_RE.finditer(content):
+                matches.setdefault(match.lastgroup, match.group(match.lastgroup))
+
+            group = next((group for group in VALUE_GROUPS if group in matches), None)
+
+            if group:
+                meter_value = float(matches[group])
+                confidence = 0.7  # Medium confidence for regex extraction
             
             # Return fallback result with extracted info
             return {
@@ -338,6 +820,13 @@ class BedrockService:
                 "raw_response": content
             }
             
+        return self._finalize_vision_result(json_result, content_cleaned, full_address)
+
+    def _finalize_vision_result(self, json_result: dict, content: str, full_address: str) -> dict:
+        """
+            Normalize parsed vision result and add metadata
+        """
+
         # Validate and fix meter_value
         if 'meter_value' in json_result:
             # Handle string numbers or leading zeros
@@ -350,7 +839,7 @@ class BedrockService:
 
         else:
             # Try to extract meter value from text if JSON parsing failed
-            value_match = re.search(r'meter[_\s]*value["\s]*:?\s*([0-9]+\.?[0-9]*)', content_cleaned, re.IGNORECASE)
+            value_match = METER_VALUE_RE.search(content)
 
             if value_match:
                 json_result['meter_value'] = float(value_match.group(1))
@@ -381,18 +870,7 @@ class BedrockService:
         
         context = self._format_context_for_chat(context_data)
         
-        # Create prompt for chat response
-        prompt = f"""
-                    You are a helpful assistant for water meter readings. Use the following data to answer questions about water usage.
-
-                    Available meter data:
-                    {context}
-
-                    User question: {query}
-
-                    Please provide a clear, helpful answer based on the available data. If the question asks for specific values, include the meter readings. 
-                    If comparing values, show the numbers clearly. If asking about locations, include the addresses.
-                """
+        prompt = _CHAT_PROMPT_TEMPLATE.format_map({"context": context, "query": query})
 
         request_body = {
             "anthropic_version": "bedrock-2023-05-31",
@@ -407,13 +885,9 @@ class BedrockService:
         }
             
         try:
-            response = self.bedrock_runtime.invoke_model(
-                modelId=self.text_model,
-                body=json.dumps(request_body)
-            )
+            response_body = await self._invoke_model(self.text_model, orjson.dumps(request_body))
             
             # Parse response
-            response_body = json.loads(response['body'].read())
             generated_text = response_body['content'][0]['text'].strip()
             
             logger.info(f"✅ Chat response generated for query: {query}")
@@ -432,16 +906,16 @@ class BedrockService:
         if not context_data:
             return "No meter readings available."
         
-        formatted = "Available meter readings:\n"
+        lines = ["Available meter readings:"]
 
-        for i, item in enumerate(context_data[:10], 1):  # Limit to top 10
-            address = item.get('full_address', 'Unknown address')
-            value = item.get('meter_value', 'Unknown')
-            formatted += f"{i}. {address}: {value} units\n"
-        
-        return formatted
+        lines.extend(
+            f"{i}. {item.get('full_address', 'Unknown address')}: {item.get('meter_value', 'Unknown')} units"
+            for i, item in enumerate(context_data[:10], 1)  # Limit to top 10
+        )
+
+        return "\n".join(lines) + "\n"
     
-    def health_check(self) -> dict:
+    async def health_check(self) -> dict:
         """
             Check Bedrock service health
         """
@@ -466,4 +940,11 @@ class BedrockService:
             Initialize the Bedrock service
         """
 
-        return await self.connect()
\ No newline at end of file
+        if not await self.connect():
+            return False
+
+        if VISION_BATCH_MAX_SIZE > 1:
+            self._vision_queue = asyncio.Queue()
+            self._vision_batcher_task = asyncio.create_task(self._vision_batcher())
+
+        return True
\ No newline at end of file
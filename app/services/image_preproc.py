@@ -0,0 +1,83 @@
+"""
+    Image preprocessing helpers
+"""
+
+import io
+import logging
+
+from PIL import Image, ImageFilter, ImageStat
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Meter digits stay legible at this size, and smaller payloads dominate upload latency
+MAX_VISION_DIMENSION = 768
+JPEG_QUALITY = 82
+
+# Small JPEGs are forwarded untouched
+PASSTHROUGH_MAX_BYTES = 200 * 1024
+
+# The 3x3 smoothing kernel ImageEnhance.Sharpness blends against, and its identity counterpart
+SMOOTH_KERNEL = [weight / 13 for weight in (1, 1, 1, 1, 5, 1, 1, 1, 1)]
+IDENTITY_KERNEL = [0, 0, 0, 0, 1, 0, 0, 0, 0]
+
+def downscale_image(image_bytes: bytes, max_dimension: int = MAX_VISION_DIMENSION) -> bytes:
+    """
+        Shrink image so its longest side fits the vision model and re-encode as JPEG
+    """
+
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+
+        # Already small enough and in the format the vision request declares
+        if image.format == "JPEG" and max(image.size) <= max_dimension and len(image_bytes) <= PASSTHROUGH_MAX_BYTES:
+            return image_bytes
+
+        # Let the JPEG decoder scale in the DCT domain instead of decoding full resolution
+        image.draft("RGB", (max_dimension, max_dimension))
+
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+
+    except Exception as exc:
+        logger.warning(f"Image downscaling failed: {str(exc)}, using original image")
+        return image_bytes
+
+    logger.info(f"Downscaled image from {len(image_bytes)} to {output.tell()} bytes")
+    return output.getvalue()
+
+def enhance_image(image: Image.Image, contrast: float, sharpness: float) -> Image.Image:
+    """
+        Apply ImageEnhance-style contrast and sharpness to an RGB image as a single 3x3 kernel pass;
+        matches the two-step ImageEnhance output up to rounding, except that edge pixels are sharpened too
+    """
+
+    if contrast == 1.0 and sharpness == 1.0:
+        return image
+
+    # Both enhancements are linear blends, so they fold into one kernel plus a constant offset:
+    # contrast * (sharpness * x + (1 - sharpness) * smooth(x)) + (1 - contrast) * mean
+    mean = ImageStat.Stat(image.convert("L")).mean[0] if contrast != 1.0 else 0.0
+    kernel = [
+        contrast * ((1 - sharpness) * smooth + sharpness * identity)
+        for smooth, identity in zip(SMOOTH_KERNEL, IDENTITY_KERNEL)
+    ]
+
+    # Kernel filters leave a 1px frame untouched, so filter an edge-padded copy and crop the frame back off
+    width, height = image.size
+    padded = Image.new(image.mode, (width + 2, height + 2))
+    padded.paste(image, (1, 1))
+    padded.paste(image.crop((0, 0, width, 1)), (1, 0))
+    padded.paste(image.crop((0, height - 1, width, height)), (1, height + 1))
+    padded.paste(padded.crop((1, 0, 2, height + 2)), (0, 0))
+    padded.paste(padded.crop((width, 0, width + 1, height + 2)), (width + 1, 0))
+
+    enhanced = padded.filter(ImageFilter.Kernel((3, 3), kernel, scale=1, offset=(1 - contrast) * mean))
+
+    return enhanced.crop((1, 1, width + 1, height + 1))
@@ -3,20 +3,105 @@
 """
 
 import os
-import time
+import json
+import math
+import itertools
+import asyncio
 import logging
+import numpy as np
 
+from models.schemas import MeterAddress
+from services.query_cache import query_cache, qv_cache
 from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType, utility
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+EMBEDDING_DIM = 1024
+
+# New collections store vectors as float16, halving Milvus memory and insert/search payloads.
+# Collections created earlier keep FLOAT_VECTOR; the dtype in use is read from the schema
+VECTOR_DATA_TYPE = DataType.FLOAT16_VECTOR
+VECTOR_NUMPY_TYPES = {DataType.FLOAT16_VECTOR: np.float16, DataType.FLOAT_VECTOR: np.float32}
+VECTOR_FIELDS = ("address_embedding", "combined_embedding")
+
+# Scalar fields filtered by the recency search; INVERTED indexes serve equality/IN filters
+# and STL_SORT serves the timestamp window
+SCALAR_INDEXES = {"city": "INVERTED", "street_name": "INVERTED", "timestamp": "STL_SORT"}
+
+# Embeddings are unit-normalized, so inner product equals cosine similarity.
+# HNSW suits the read-heavy workload; MILVUS_INDEX_TYPE=IVF_SQ8 downgrades small deployments to a lighter index
+INDEX_TYPE = os.getenv("MILVUS_INDEX_TYPE", "HNSW").upper()
+METRIC_TYPE = "IP"
+
+# HNSW graph degree and build/search breadth; ef is raised to topK when a search asks for more
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF = int(os.getenv("MILVUS_HNSW_EF", "64"))
+
+# IVF: nlist ≈ 4·sqrt(rows) and nprobe ≈ sqrt(nlist), sized from the collection when the index is built
+MIN_NLIST = 128
+MAX_NLIST = 65536
+MIN_NPROBE = 8
+DEFAULT_EXPECTED_ROWS = 10000
+REBUILD_GROWTH_FACTOR = 4
+
+# Concurrent searches arriving within this window are sent to Milvus as one batch
+SEARCH_BATCH_WINDOW = 0.01
+SEARCH_BATCH_MAX_SIZE = 32
+
+# Group commit: one drain task inserts buffered readings, so a lone upload is inserted at once and
+# uploads arriving during an insert share the next one (up to INSERT_BATCH_ROWS rows per call).
+# insert() alone makes rows searchable, so the expensive segment flush only runs periodically and on shutdown
+INSERT_BATCH_ROWS = 1000
+FLUSH_INTERVAL = 60
+INSERT_COLUMNS = 10
+
+# Searches and queries are spread round robin over this many gRPC channels
+POOL_SIZE = int(os.getenv("MILVUS_POOL_SIZE", "8"))
+POOL_ALIASES = tuple(f"pool-{index}" for index in range(POOL_SIZE))
+
+def as_vector(value) -> np.ndarray:
+    """
+        Vector field from a query result as float32; FLOAT16_VECTOR values come back as raw bytes
+    """
+
+    if isinstance(value, list) and len(value) == 1 and isinstance(value[0], bytes):
+        value = value[0]
+
+    if isinstance(value, (bytes, bytearray)):
+        return np.frombuffer(value, dtype=np.float16).astype(np.float32)
+
+    return np.asarray(value, dtype=np.float32)
+
 class MilvusService:
     def __init__(self):
         self.collection_name = "water_meters"
         self.collection = None
         self.connected = False
+        self.loaded = False
+        self.vector_dtype = VECTOR_NUMPY_TYPES[VECTOR_DATA_TYPE]
+
+        # Collection handles on the pooled connections
+        self._pool = None
+
+        # Index sizing, recomputed whenever the vector indexes are (re)built
+        self.nlist = MIN_NLIST
+        self.search_params = self._search_params(MIN_NLIST)
+
+        # Search micro-batching
+        self._search_queue = None
+        self._search_worker = None
+        self._search_tasks = set()
+
+        # Insert buffering: one list per schema field, plus one future per row
+        # that resolves once the batch holding it is actually inserted
+        self._buffer = [[] for _ in range(INSERT_COLUMNS)]
+        self._buffer_waiters = []
+        self._buffer_lock = asyncio.Lock()
+        self._insert_task = None
+        self._flusher_task = None
     
     async def connect(self) -> bool:
         """
@@ -33,14 +118,20 @@ class MilvusService:
             try:
                 logger.info(f"Attempting to connect to Milvus at {host}:{port} (attempt {attempt + 1})")
                 
-                connections.connect(
+                # pymilvus is synchronous, so every RPC runs off the event loop
+                await asyncio.to_thread(
+                    connections.connect,
                     alias="default",
                     host=host,
                     port=port,
                     timeout=10
                 )
                 
-                collections = utility.list_collections()
+                # Extra channels keep concurrent searches from queuing behind each other on one connection
+                for alias in POOL_ALIASES:
+                    await asyncio.to_thread(connections.connect, alias=alias, host=host, port=port, timeout=10)
+
+                collections = await asyncio.to_thread(utility.list_collections)
                 logger.info(f"Successfully connected to Milvus. Existing collections: {collections}")
                 
                 self.connected = True
@@ -51,13 +142,62 @@ class MilvusService:
 
                 if attempt < max_retries - 1:
                     logger.info(f"Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
+                    await asyncio.sleep(retry_delay)
 
                 else:
                     logger.error("All connection attempts failed")
                     self.connected = False
                     return False
     
+    async def close(self) -> None:
+        """
+            Stop the search batcher and disconnect from Milvus
+        """
+
+        background = [task for task in (self._search_worker, self._flusher_task) if task]
+
+        for task in background:
+            task.cancel()
+
+        await asyncio.gather(*background, return_exceptions=True)
+
+        # Searches still waiting in the queue fail instead of hanging forever
+        while self._search_queue and not self._search_queue.empty():
+            future = self._search_queue.get_nowait()[4]
+
+            if not future.done():
+                future.set_exception(RuntimeError("Milvus service closed"))
+
+        # Batches already sent to Milvus resolve their own futures
+        await asyncio.gather(*self._search_tasks, return_exceptions=True)
+
+        self._search_queue = None
+        self._search_worker = None
+        self._search_tasks = set()
+        self._flusher_task = None
+
+        if self._insert_task:
+            await asyncio.gather(self._insert_task, return_exceptions=True)
+            self._insert_task = None
+
+        if self.collection:
+            await self._drain_buffer()
+
+            try:
+                await asyncio.to_thread(self.collection.flush)
+
+            except Exception as exc:
+                logger.error(f"❌ Final flush failed: {str(exc)}", exc_info=True)
+
+        if self.connected:
+            for alias in ("default", *POOL_ALIASES):
+                await asyncio.to_thread(connections.disconnect, alias)
+
+        self._pool = None
+        self.collection = None
+        self.connected = False
+        self.loaded = False
+
     async def create_collection(self) -> bool:
         """
             Create the water meters collection with proper schema
@@ -68,6 +208,9 @@ class MilvusService:
             if utility.has_collection(self.collection_name):
                 logger.info(f'Collection "{self.collection_name}" already exists')
                 self.collection = Collection(self.collection_name)
+
+                vector_field = next(field for field in self.collection.schema.fields if field.name == VECTOR_FIELDS[0])
+                self.vector_dtype = VECTOR_NUMPY_TYPES.get(vector_field.dtype, np.float32)
                 return True
             
             # Define collection schema
@@ -81,14 +224,14 @@ class MilvusService:
                 ),
                 FieldSchema(
                     name='address_embedding', 
-                    dtype=DataType.FLOAT_VECTOR, 
-                    dim=1024,
+                    dtype=VECTOR_DATA_TYPE, 
+                    dim=EMBEDDING_DIM,
                     description='Address semantic embedding'
                 ),
                 FieldSchema(
                     name='combined_embedding', 
-                    dtype=DataType.FLOAT_VECTOR, 
-                    dim=1024,
+                    dtype=VECTOR_DATA_TYPE, 
+                    dim=EMBEDDING_DIM,
                     description='Combined address + context embedding'
                 ),
                 FieldSchema(
@@ -141,49 +284,132 @@ class MilvusService:
                 name=self.collection_name,
                 schema=schema
             )
+            self.vector_dtype = VECTOR_NUMPY_TYPES[VECTOR_DATA_TYPE]
             
             logger.info(f'Created collection "{self.collection_name}" successfully')
             return True
             
         except Exception as exc:
-            logger.error(f'Failed to create collection: {str(exc)}')
+            logger.error(f'Failed to create collection: {str(exc)}', exc_info=True)
             return False
     
-    async def create_indexes(self) -> bool:
+    @staticmethod
+    def _nlist_for(rows: int) -> int:
         """
-            Create vector indexes for efficient search
+            IVF bucket count for a collection of the given size
+        """
+
+        return min(MAX_NLIST, max(MIN_NLIST, int(4 * math.sqrt(rows))))
+
+    @staticmethod
+    def _index_params(nlist: int) -> dict:
+        """
+            Index build parameters for the configured index type
+        """
+
+        if INDEX_TYPE == "HNSW":
+            params = {"M": HNSW_M, "efConstruction": HNSW_EF_CONSTRUCTION}
+
+        else:
+            params = {"nlist": nlist}
+
+        return {"metric_type": METRIC_TYPE, "index_type": INDEX_TYPE, "params": params}
+
+    @staticmethod
+    def _search_params(nlist: int) -> dict:
+        """
+            Search parameters matching the configured index (nlist only applies to IVF)
+        """
+
+        if INDEX_TYPE == "HNSW":
+            return {"metric_type": METRIC_TYPE, "params": {"ef": HNSW_EF}}
+
+        return {"metric_type": METRIC_TYPE, "params": {"nprobe": max(MIN_NPROBE, int(math.sqrt(nlist)))}}
+
+    def _set_nlist(self, nlist: int) -> None:
+        self.nlist = nlist
+        self.search_params = self._search_params(nlist)
+
+    async def create_indexes(self, rebuild: bool = False) -> bool:
+        """
+            Create vector indexes for efficient search, sized from the current row count
         """
 
         if not self.collection:
                 return False
 
+        # Index builds block until done, so they run off the event loop
+        return await asyncio.to_thread(self._build_indexes, rebuild)
+
+    def _build_indexes(self, rebuild: bool) -> bool:
+        """
+            Blocking part of create_indexes
+        """
+
         try:
-            # Index parameters for vector fields
-            index_params = {
-                'metric_type': 'L2',
-                'index_type': 'IVF_FLAT',
-                'params': {'nlist': 128}
-            }
-            
-            # Create index for address_embedding
-            self.collection.create_index(
-                field_name='address_embedding',
-                index_params=index_params
-            )
-            
-            # Create index for combined_embedding
-            self.collection.create_index(
-                field_name='combined_embedding', 
-                index_params=index_params
-            )
-            
-            logger.info('Created vector indexes successfully')
+            nlist = self._nlist_for(self.collection.num_entities or DEFAULT_EXPECTED_ROWS)
+
+            for field_name in VECTOR_FIELDS:
+                existing = next((index for index in self.collection.indexes if index.field_name == field_name), None)
+
+                if existing:
+                    params = existing.params
+
+                    if (not rebuild
+                            and params.get('index_type') == INDEX_TYPE
+                            and params.get('metric_type') == METRIC_TYPE):
+                        # Keep searching with the bucket count the index was built with
+                        nlist = int(params.get('nlist') or params.get('params', {}).get('nlist') or nlist)
+                        continue
+
+                    # Rebuild indexes created with older parameters or for a smaller collection
+                    logger.info(f'Dropping index on "{field_name}" for rebuild: {params}')
+                    self.collection.release()
+                    self.loaded = False
+                    self.collection.drop_index(index_name=existing.index_name)
+
+                self.collection.create_index(
+                    field_name=field_name,
+                    index_params=self._index_params(nlist)
+                )
+
+            indexed_fields = {index.field_name for index in self.collection.indexes}
+
+            for field_name, index_type in SCALAR_INDEXES.items():
+                if field_name not in indexed_fields:
+                    self.collection.create_index(field_name=field_name, index_params={"index_type": index_type})
+
+            self._set_nlist(nlist)
+            logger.info(f'{INDEX_TYPE} vector indexes ready (search params: {self.search_params["params"]})')
             return True
             
         except Exception as exc:
-            logger.error(f'Failed to create indexes: {str(exc)}')
+            logger.error(f'Failed to create indexes: {str(exc)}', exc_info=True)
             return False
     
+    async def rebuild_indexes(self, force: bool = False) -> dict:
+        """
+            Rebuild vector indexes when the collection has outgrown the current nlist
+        """
+
+        if not self.collection:
+            return {"rebuilt": False, "error": "Collection not available"}
+
+        rows = await asyncio.to_thread(lambda: self.collection.num_entities)
+        indexed_rows = (self.nlist / 4) ** 2
+
+        # HNSW doesn't depend on collection size, so it is only rebuilt on request
+        if not force and (INDEX_TYPE == "HNSW" or rows <= REBUILD_GROWTH_FACTOR * indexed_rows):
+            return {"rebuilt": False, "num_entities": rows, "nlist": self.nlist}
+
+        if not await self.create_indexes(rebuild=True) or not await self.load_collection():
+            return {"rebuilt": False, "error": "Index rebuild failed"}
+
+        query_cache.invalidate_all()
+        qv_cache.invalidate_all()
+
+        return {"rebuilt": True, "num_entities": rows, "nlist": self.nlist, "search_params": self.search_params}
+
     async def initialize(self) -> bool:
         """
             Complete initialization process
@@ -203,14 +429,69 @@ class MilvusService:
             if not await self.create_indexes():
                 logger.error("Failed to create indexes")
                 return False
+
+            # Loaded once here so search requests never pay a load RPC
+            if not await self.load_collection():
+                logger.error("Failed to load collection")
+                return False
+
+            self._pool = itertools.cycle([
+                await asyncio.to_thread(Collection, self.collection_name, using=alias)
+                for alias in POOL_ALIASES
+            ] or [self.collection])
             
             logger.info('Milvus service initialized successfully')
             return True
             
         except Exception as exc:
-            logger.error(f'Failed to initialize Milvus service: {str(exc)}')
+            logger.error(f'Failed to initialize Milvus service: {str(exc)}', exc_info=True)
             return False
     
+    def pooled_collection(self) -> Collection:
+        """
+            Collection handle on the next pooled connection, for searches and queries
+        """
+
+        return next(self._pool) if self._pool else self.collection
+
+    async def load_collection(self) -> bool:
+        """
+            Load collection into memory once, so requests don't pay a load RPC
+        """
+
+        if not self.collection:
+            return False
+
+        if self.loaded:
+            return True
+
+        try:
+            await asyncio.to_thread(self.collection.load)
+
+        except Exception as exc:
+            logger.error(f'Failed to load collection: {str(exc)}', exc_info=True)
+            return False
+
+        self.loaded = True
+        logger.info(f'Loaded collection "{self.collection_name}"')
+
+        await asyncio.to_thread(self._warm_up)
+        return True
+
+    def _warm_up(self) -> None:
+        """
+            Run a throwaway search per vector field so the first user query doesn't fault the index in
+        """
+
+        probe = [np.zeros(EMBEDDING_DIM, dtype=self.vector_dtype)]
+
+        for field_name in VECTOR_FIELDS:
+            try:
+                self.collection.search(probe, field_name, self.search_params, limit=1)
+
+            except Exception as exc:
+                logger.warning(f'Warm-up search on "{field_name}" failed: {str(exc)}')
+
     def get_collection_info(self) -> dict | None:
         """
             Get collection information
@@ -220,10 +501,12 @@ class MilvusService:
             return None
         
         try:
-            self.collection.load()
+            if not self.loaded:
+                self.collection.load()
+                self.loaded = True
         
         except Exception as exc:
-            logger.error(f'Failed to get collection info: {str(exc)}')
+            logger.error(f'Failed to get collection info: {str(exc)}', exc_info=True)
             return None
             
         return {
@@ -242,7 +525,7 @@ class MilvusService:
             }
         }
     
-    def health_check(self) -> dict:
+    async def health_check(self) -> dict:
         """
             Check Milvus connection health
         """
@@ -251,7 +534,7 @@ class MilvusService:
             return {'status': 'disconnected', 'error': 'Not connected to Milvus'}
 
         try:
-            collections = utility.list_collections()
+            collections = await asyncio.to_thread(utility.list_collections)
             
         except Exception as exc:
             return {'status': 'error', 'error': str(exc)}
@@ -267,7 +550,7 @@ class MilvusService:
     async def store_meter_reading(
         self, 
         reading_id: str,
-        address_info: dict,
+        address: MeterAddress,
         meter_value: float,
         confidence: float,
         embeddings: dict,
@@ -276,34 +559,233 @@ class MilvusService:
         meter_type: str
     ) -> bool:
         """
-            Store complete meter reading with embeddings in Milvus
+            Buffer a complete meter reading for the next batched insert, embeddings cast to the field dtype
         """
 
         if not self.collection:
             logger.error("Collection not available for storage")
             return False
         
-        # Prepare data for insertion
-        data = [
-            [reading_id],
-            [embeddings["address_embedding"]],
-            [embeddings["combined_embedding"]],
-            [meter_value],
-            [address_info.get("city", "")],
-            [address_info.get("street_name", "")],
-            [address_info.get("street_number", "")],
-            [embeddings["full_address"]],
-            [timestamp],
-            [confidence]
-        ]
-
-        try:                       
-            self.collection.insert(data)
-            self.collection.flush()
-            
-            logger.info(f"✅ Stored meter reading {reading_id} in Milvus")
-            return True
-            
+        row = self._row(reading_id, address, meter_value, confidence, embeddings, timestamp)
+
+        inserted = asyncio.get_running_loop().create_future()
+
+        async with self._buffer_lock:
+            for column, value in zip(self._buffer, row):
+                column.append(value)
+
+            self._buffer_waiters.append(inserted)
+
+        if self._insert_task is None or self._insert_task.done():
+            self._insert_task = asyncio.create_task(self._drain_buffer())
+
+        if self._flusher_task is None or self._flusher_task.done():
+            self._flusher_task = asyncio.create_task(self._flusher())
+
+        # Group commit: report success only once the batch holding this row is in Milvus
+        return await inserted
+
+    def _row(
+        self,
+        reading_id: str,
+        address: MeterAddress,
+        meter_value: float,
+        confidence: float,
+        embeddings: dict,
+        timestamp: int
+    ) -> tuple:
+        """
+            One reading as an insert row; column order matches the collection schema
+        """
+
+        return (
+            reading_id,
+            np.asarray(embeddings["address_embedding"], dtype=self.vector_dtype),
+            np.asarray(embeddings["combined_embedding"], dtype=self.vector_dtype),
+            meter_value,
+            address.city,
+            address.street_name,
+            address.street_number,
+            embeddings["full_address"],
+            timestamp,
+            confidence
+        )
+
+    async def _insert_buffered(self) -> bool:
+        """
+            Take up to INSERT_BATCH_ROWS buffered rows, insert them in one call and resolve their store calls
+        """
+
+        async with self._buffer_lock:
+            if not self._buffer_waiters:
+                return True
+
+            rows = min(len(self._buffer_waiters), INSERT_BATCH_ROWS)
+            batch = [column[:rows] for column in self._buffer]
+            waiters = self._buffer_waiters[:rows]
+            self._buffer = [column[rows:] for column in self._buffer]
+            self._buffer_waiters = self._buffer_waiters[rows:]
+
+        try:
+            await asyncio.to_thread(self.collection.insert, batch)
+
+        except asyncio.CancelledError:
+            self._resolve_waiters(waiters, False)
+            raise
+
         except Exception as exc:
-            logger.error(f"❌ Failed to store meter reading: {str(exc)}")
+            logger.error(f"❌ Failed to insert {rows} meter readings: {str(exc)}", exc_info=True)
+            self._resolve_waiters(waiters, False)
             return False
+
+        self._resolve_waiters(waiters, True)
+
+        # New readings change search results
+        query_cache.invalidate_all()
+        qv_cache.invalidate_all()
+
+        logger.info(f"✅ Inserted {rows} meter readings into Milvus")
+        return True
+
+    def _resolve_waiters(self, waiters: list, inserted: bool) -> None:
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(inserted)
+
+    async def _drain_buffer(self) -> None:
+        """
+            Insert buffered rows until the buffer is empty; rows buffered meanwhile form the next batch
+        """
+
+        while self._buffer_waiters:
+            await self._insert_buffered()
+
+    async def _flusher(self) -> None:
+        """
+            Flush segments every FLUSH_INTERVAL
+        """
+
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+
+            try:
+                await asyncio.to_thread(self.collection.flush)
+
+            except Exception as exc:
+                logger.error(f"❌ Periodic flush failed: {str(exc)}", exc_info=True)
+
+    async def search(self, query_embedding: np.ndarray, anns_field: str, limit: int, output_fields: list) -> list:
+        """
+            Vector search coalesced with concurrent searches into one Milvus call
+        """
+
+        if self._search_worker is None or self._search_worker.done():
+            self._search_queue = asyncio.Queue()
+            self._search_worker = asyncio.create_task(self._search_batcher())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._search_queue.put((query_embedding, anns_field, limit, tuple(output_fields), future))
+
+        return await future
+
+    async def search_rows(self, query_embedding: np.ndarray, anns_field: str, limit: int, output_fields: list) -> list:
+        """
+            Two-phase search: ids and distances from the vector search, then payload for those ids only
+        """
+
+        hits = await self.search(query_embedding, anns_field, limit, [])
+
+        if not hits:
+            return []
+
+        ids = [hit.id for hit in hits]
+        rows = {
+            row["id"]: row
+            for row in await asyncio.to_thread(
+                self.pooled_collection().query,
+                expr=f"id in {json.dumps(ids, ensure_ascii=False)}",
+                output_fields=output_fields
+            )
+        }
+
+        return [(rows[hit.id], hit.distance) for hit in hits if hit.id in rows]
+
+    async def _search_batcher(self) -> None:
+        """
+            Drain queued searches for up to SEARCH_BATCH_WINDOW and run them in batches
+        """
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._search_queue.get()]
+            deadline = loop.time() + SEARCH_BATCH_WINDOW
+
+            while len(batch) < SEARCH_BATCH_MAX_SIZE:
+                timeout = deadline - loop.time()
+
+                if timeout <= 0:
+                    break
+
+                try:
+                    batch.append(await asyncio.wait_for(self._search_queue.get(), timeout))
+
+                except asyncio.TimeoutError:
+                    break
+
+            # Don't hold the next window behind this batch's round trip
+            task = asyncio.create_task(self._run_search_batch(batch))
+            self._search_tasks.add(task)
+            task.add_done_callback(self._search_tasks.discard)
+
+    async def _run_search_batch(self, batch: list) -> None:
+        """
+            Run one multi-vector Milvus search per (field, output fields) group, concurrently
+        """
+
+        groups = {}
+
+        for item in batch:
+            groups.setdefault((item[1], item[3]), []).append(item)
+
+        await asyncio.gather(*(
+            self._search_group(anns_field, output_fields, items)
+            for (anns_field, output_fields), items in groups.items()
+        ))
+
+    async def _search_group(self, anns_field: str, output_fields: tuple, items: list) -> None:
+        """
+            Search one field for every queued vector in items and resolve their futures
+        """
+
+        limit = max(item[2] for item in items)
+        search_params = self.search_params
+
+        # HNSW requires ef >= topK
+        if search_params["params"].get("ef", limit) < limit:
+            search_params = {**search_params, "params": {"ef": limit}}
+
+        try:
+            results = await asyncio.to_thread(
+                self.pooled_collection().search,
+                [np.asarray(item[0], dtype=self.vector_dtype) for item in items],
+                anns_field,
+                search_params,
+                limit=limit,
+                output_fields=list(output_fields)
+            )
+
+        except Exception as exc:
+            logger.error(f"❌ Batched search failed: {str(exc)}", exc_info=True)
+
+            for item in items:
+                if not item[4].done():
+                    item[4].set_exception(exc)
+
+            return
+
+        logger.info(f"Batched {len(items)} searches on {anns_field}")
+
+        for item, hits in zip(items, results):
+            if not item[4].done():
+                item[4].set_result(list(hits)[:item[2]])
@@ -0,0 +1,226 @@
+"""
+    In-process caches for search results: exact query keys and query-embedding similarity
+"""
+
+import time
+import random
+import threading
+import numpy as np
+from collections import OrderedDict
+
+
+class QueryCache:
+    def __init__(self, max_size: int = 2000, ttl_seconds: float = 300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: tuple):
+        """
+            Cached value for key, or None when missing or expired
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key: tuple, value) -> None:
+        """
+            Store value under key, evicting least recently used entries over max_size
+        """
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate_all(self) -> None:
+        """
+            Drop every cached entry, e.g. after new readings are stored
+        """
+
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """
+            Hit/miss counters and current size
+        """
+
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0
+            }
+
+
+class QVCache:
+    """
+        Similarity cache keyed by query embedding: a query within an L2 threshold of a
+        cached query vector reuses its results. The threshold is learned per vector field
+        from sampled hits that are re-run against Milvus and compared by top-k overlap.
+    """
+
+    def __init__(
+            self,
+            max_size: int = 256,
+            threshold: float = 0.15,
+            min_threshold: float = 0.02,
+            max_threshold: float = 0.35,
+            validation_rate: float = 0.05,
+            min_overlap: float = 0.8
+        ):
+        self.max_size = max_size
+        self.initial_threshold = threshold
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.validation_rate = validation_rate
+        self.min_overlap = min_overlap
+
+        # vector_field -> {"keys": (max_size, dim) float32, "entries": [(limit, results)], "last_used": [...]}
+        self._regions = {}
+        self._thresholds = {}
+        self._clock = 0
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "validations": 0}
+
+    def probe(self, query_embedding, vector_field: str, limit: int) -> list | None:
+        """
+            Results cached for the nearest query vector within the field's threshold, or None
+        """
+
+        with self._lock:
+            region = self._regions.get(vector_field)
+
+            if region is None or not region["entries"]:
+                self.stats["misses"] += 1
+                return None
+
+            size = len(region["entries"])
+            distances = np.linalg.norm(region["keys"][:size] - np.asarray(query_embedding, dtype=np.float32), axis=1)
+            index = int(distances.argmin())
+            cached_limit, results = region["entries"][index]
+
+            if distances[index] > self.threshold(vector_field) or cached_limit < limit:
+                self.stats["misses"] += 1
+                return None
+
+            self._clock += 1
+            region["last_used"][index] = self._clock
+            self.stats["hits"] += 1
+            return results[:limit]
+
+    def put(self, query_embedding, vector_field: str, limit: int, results: list) -> None:
+        """
+            Cache results under query_embedding, replacing the least recently used slot when full
+        """
+
+        vector = np.asarray(query_embedding, dtype=np.float32)
+
+        with self._lock:
+            region = self._regions.get(vector_field)
+
+            if region is None:
+                region = self._regions[vector_field] = {
+                    "keys": np.empty((self.max_size, vector.shape[0]), dtype=np.float32),
+                    "entries": [],
+                    "last_used": []
+                }
+
+            self._clock += 1
+
+            if len(region["entries"]) < self.max_size:
+                index = len(region["entries"])
+                region["entries"].append((limit, results))
+                region["last_used"].append(self._clock)
+
+            else:
+                index = int(np.argmin(region["last_used"]))
+                region["entries"][index] = (limit, results)
+                region["last_used"][index] = self._clock
+                self.stats["evictions"] += 1
+
+            region["keys"][index] = vector
+
+    def threshold(self, vector_field: str) -> float:
+        """
+            Current L2 hit threshold for vector_field
+        """
+
+        return self._thresholds.get(vector_field, self.initial_threshold)
+
+    def should_validate(self) -> bool:
+        """
+            Whether a hit should be checked against a real search
+        """
+
+        return random.random() < self.validation_rate
+
+    def record_validation(self, vector_field: str, cached: list, fresh: list) -> None:
+        """
+            Tighten the threshold when a cached hit diverged from the real top-k, relax it otherwise
+        """
+
+        cached_ids = {item["id"] for item in cached}
+        fresh_ids = {item["id"] for item in fresh}
+        overlap = len(cached_ids & fresh_ids) / len(fresh_ids) if fresh_ids else float(not cached_ids)
+
+        with self._lock:
+            threshold = self.threshold(vector_field)
+
+            if overlap < self.min_overlap:
+                threshold = max(self.min_threshold, threshold * 0.8)
+
+            else:
+                threshold = min(self.max_threshold, threshold * 1.05)
+
+            self._thresholds[vector_field] = threshold
+            self.stats["validations"] += 1
+
+    def invalidate_all(self) -> None:
+        """
+            Drop every cached entry, keeping the learned thresholds
+        """
+
+        with self._lock:
+            self._regions.clear()
+
+    def get_stats(self) -> dict:
+        """
+            Hit/miss counters, sizes and learned thresholds
+        """
+
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+
+            return {
+                **self.stats,
+                "size": sum(len(region["entries"]) for region in self._regions.values()),
+                "max_size_per_field": self.max_size,
+                "thresholds": {field: self.threshold(field) for field in self._regions},
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0
+            }
+
+
+# Shared by the search functions and invalidated by MilvusService on every insert
+query_cache = QueryCache()
+qv_cache = QVCache()
@@ -1,12 +1,87 @@
+import re
+import json
+import time
+import asyncio
 import logging
+import numpy as np
 from datetime import datetime
 
 from services.bedrock_service import BedrockService
 from services.milvus_service import MilvusService
+from services.query_cache import query_cache, qv_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Payload fetched for the top-k hits only; the vector search itself returns ids and distances
+SIMILARITY_OUTPUT_FIELDS = ["id", "meter_value", "full_address", "confidence", "timestamp"]
+ADDRESS_OUTPUT_FIELDS = [*SIMILARITY_OUTPUT_FIELDS, "city", "street_name", "street_number"]
+
+# Query tokens matched against the indexed city/street_name fields, next to the stripped query itself;
+# every value (punctuation included) enters the filter only as a JSON-escaped string literal
+TOKEN_RE = re.compile(r"[\w\-]+", re.UNICODE)
+MAX_FILTER_TOKENS = 8
+
+# Recency search scans only (id, timestamp) pairs in batches of this size, starting with the
+# last day and widening the window only while fewer than `limit` rows are found
+RECENCY_SCAN_BATCH = 1000
+RECENCY_WINDOWS = (24 * 60 * 60, 7 * 24 * 60 * 60, 30 * 24 * 60 * 60, 365 * 24 * 60 * 60, None)
+
+def _address_filter(query: str) -> str:
+    """
+        IN filter on city/street_name built from the query and its tokens as escaped string literals
+    """
+
+    tokens = TOKEN_RE.findall(query)[:MAX_FILTER_TOKENS]
+    candidates = [query.strip(), " ".join(tokens), *tokens]
+
+    # Stored values keep the user's casing, so try the common variants of each candidate
+    values = list(dict.fromkeys(
+        variant for candidate in candidates for variant in (candidate, candidate.lower(), candidate.title())
+    ))
+    literals = json.dumps(values, ensure_ascii=False)
+
+    return f"city in {literals} or street_name in {literals}"
+
+def _format_similarity_hits(hits: list) -> list:
+    """
+        Convert (row, distance) hits into ranked result dicts
+    """
+
+    # Schema fields are non-nullable and were requested explicitly, so rows are indexed directly
+    return [
+        {
+            "id": row["id"],
+            "meter_value": float(row["meter_value"]),
+            "full_address": row["full_address"],
+            "confidence": float(row["confidence"]),
+            "timestamp": int(row["timestamp"]),
+            "similarity_score": float(distance),  # ← Similarity distance
+            "rank": rank
+        }
+        for rank, (row, distance) in enumerate(hits, 1)
+    ]
+
+def _format_address_hits(hits: list) -> list:
+    """
+        Convert (row, distance) hits into result dicts including the address parts
+    """
+
+    return [
+        {
+            "id": row["id"],
+            "meter_value": float(row["meter_value"]),
+            "full_address": row["full_address"],
+            "confidence": float(row["confidence"]),
+            "timestamp": int(row["timestamp"]),
+            "city": row["city"],
+            "street_name": row["street_name"],
+            "street_number": row["street_number"],
+            "similarity_score": float(distance)
+        }
+        for row, distance in hits
+    ]
+
 async def search_similar_readings(
         milvus_service: MilvusService,
         bedrock_service: BedrockService,
@@ -18,47 +93,98 @@ async def search_similar_readings(
         Complete similarity search: Query → Embedding → Vector Search → Results
     """
 
-    if not milvus_service.connected:
-        await milvus_service.connect()
-        
     if not milvus_service.collection:
-        await milvus_service.create_collection()
+        return []
+
+    cache_key = ("search_similar_readings", search_type, query, limit)
+    cached = query_cache.get(cache_key)
+
+    if cached is not None:
+        return cached
 
     try:
-        query_embedding = await bedrock_service.generate_embedding(query)
+        query_embedding = await bedrock_service.generate_query_embedding(query)
         
         # Step 3: Choose vector field based on search type
         vector_field = "combined_embedding" if search_type == "combined" else "address_embedding"
         
-        # Step 4: Perform similarity search
-        search_params = {"metric_type": "L2", "params": {"nprobe": 10}}
-        results = milvus_service.collection.search(
-            [query_embedding],          # Query vector
+        # Paraphrased queries land near a cached query vector; sampled hits are re-run to tune the threshold
+        similar = qv_cache.probe(query_embedding, vector_field, limit)
+
+        if similar is not None and not qv_cache.should_validate():
+            return similar
+
+        # Step 4: Perform similarity search (batched with concurrent queries)
+        hits = await milvus_service.search_rows(
+            query_embedding,            # Query vector
             vector_field,               # Which embedding field to search
-            search_params,              # Search parameters
-            limit=limit,                # Number of results
-            output_fields=["id", "meter_value", "full_address", "confidence", "timestamp"]
+            limit,                      # Number of results
+            SIMILARITY_OUTPUT_FIELDS
         )
     
     except Exception as exc:
         logger.error(f"❌ Similarity search failed: {str(exc)}")
         return []
         
-    formatted_results = []
-    for result in results[0]:  # results[0] because we sent 1 query
-        formatted_results.append({
-            "id": result.entity.get("id"),
-            "meter_value": float(result.entity.get("meter_value") or 0),
-            "full_address": result.entity.get("full_address"),
-            "confidence": float(result.entity.get("confidence") or 0),
-            "timestamp": int(result.entity.get("timestamp") or 0),
-            "similarity_score": float(result.distance),  # ← Similarity distance
-            "rank": len(formatted_results) + 1
-        })
+    formatted_results = _format_similarity_hits(hits)
     
     logger.info(f"✅ Found {len(formatted_results)} similar readings for query: {query[:50]}...")
+
+    if similar is not None:
+        qv_cache.record_validation(vector_field, similar, formatted_results)
+
+    if formatted_results:
+        query_cache.put(cache_key, formatted_results)
+        qv_cache.put(query_embedding, vector_field, limit, formatted_results)
+
     return formatted_results
 
+async def search_both(
+        milvus_service: MilvusService,
+        bedrock_service: BedrockService,
+        query: str,
+        limit: int = 10
+    ) -> dict:
+    """
+        Combined and address similarity search sharing one query embedding and one batcher window
+    """
+
+    if not milvus_service.collection:
+        return {"combined": [], "address": []}
+
+    cache_keys = {
+        search_type: ("search_similar_readings", search_type, query, limit)
+        for search_type in ("combined", "address")
+    }
+    cached = {search_type: query_cache.get(key) for search_type, key in cache_keys.items()}
+
+    if all(results is not None for results in cached.values()):
+        return cached
+
+    try:
+        query_embedding = await bedrock_service.generate_query_embedding(query)
+
+        # Both searches are queued together, so the batcher sends them to Milvus in the same pass
+        combined_hits, address_hits = await asyncio.gather(
+            milvus_service.search_rows(query_embedding, "combined_embedding", limit, SIMILARITY_OUTPUT_FIELDS),
+            milvus_service.search_rows(query_embedding, "address_embedding", limit, SIMILARITY_OUTPUT_FIELDS)
+        )
+
+    except Exception as exc:
+        logger.error(f"❌ Combined/address search failed: {str(exc)}")
+        return {"combined": [], "address": []}
+
+    results = {
+        "combined": _format_similarity_hits(combined_hits),
+        "address": _format_similarity_hits(address_hits)
+    }
+
+    for search_type, formatted_results in results.items():
+        if formatted_results:
+            query_cache.put(cache_keys[search_type], formatted_results)
+
+    return results
+
 async def search_by_address(
         milvus_service: MilvusService,
         bedrock_service: BedrockService,
@@ -72,41 +198,30 @@ async def search_by_address(
     if not milvus_service.collection:
         return []
 
-    try:
-        milvus_service.collection.load()
+    cache_key = ("search_by_address", query, limit)
+    cached = query_cache.get(cache_key)
 
-        if not bedrock_service.connected:
-            await bedrock_service.connect()
-        
-        # Generate query embedding
-        query_embedding = await bedrock_service.generate_embedding(query)
+    if cached is not None:
+        return cached
+
+    try:
+        # Generate query embedding (cached per normalized query tokens)
+        query_embedding = await bedrock_service.generate_query_embedding(query)
         
         # Search in address_embedding field
-        search_params = {"metric_type": "L2", "params": {"nprobe": 10}}
-        results = milvus_service.collection.search(
-            [query_embedding],
+        hits = await milvus_service.search_rows(
+            query_embedding,
             "address_embedding",
-            search_params,
-            limit=limit,
-            output_fields=["id", "meter_value", "full_address", "confidence", "timestamp", "city", "street_name", "street_number"]
+            limit,
+            ADDRESS_OUTPUT_FIELDS
         )
         
         # Format results
-        formatted_results = []
-
-        for result in results[0]:
-            formatted_results.append({
-                "id": result.entity.get("id"),
-                "meter_value": float(result.entity.get("meter_value")),
-                "full_address": result.entity.get("full_address"),
-                "confidence": float(result.entity.get("confidence")),
-                "timestamp": int(result.entity.get("timestamp")),
-                "city": result.entity.get("city"),
-                "street_name": result.entity.get("street_name"),
-                "street_number": result.entity.get("street_number"),
-                "similarity_score": float(result.distance)
-            })
+        formatted_results = _format_address_hits(hits)
         
+        if formatted_results:
+            query_cache.put(cache_key, formatted_results)
+
         return formatted_results
         
     except Exception as exc:
@@ -125,46 +240,94 @@ async def search_by_context(
 
     if not milvus_service.collection:
         return []
-    
-    try:   
-        milvus_service.collection.load()
 
-        if not bedrock_service.connected:
-            await bedrock_service.connect()
-        
-        query_embedding = await bedrock_service.generate_embedding(query)
+    cache_key = ("search_by_context", query, limit)
+    cached = query_cache.get(cache_key)
+
+    if cached is not None:
+        return cached
+    
+    try:
+        query_embedding = await bedrock_service.generate_query_embedding(query)
         
         # Search in combined_embedding field
-        search_params = {"metric_type": "L2", "params": {"nprobe": 10}}
-        results = milvus_service.collection.search(
-            [query_embedding],
-            "combined_embedding", 
-            search_params,
-            limit=limit,
-            output_fields=["id", "meter_value", "full_address", "confidence", "timestamp", "city", "street_name", "street_number"]
+        hits = await milvus_service.search_rows(
+            query_embedding,
+            "combined_embedding",
+            limit,
+            ADDRESS_OUTPUT_FIELDS
         )
         
         # Format results
-        formatted_results = []
-        for result in results[0]:
-            formatted_results.append({
-                "id": result.entity.get("id"),
-                "meter_value": float(result.entity.get("meter_value")),
-                "full_address": result.entity.get("full_address"),
-                "confidence": float(result.entity.get("confidence")),
-                "timestamp": int(result.entity.get("timestamp")),
-                "city": result.entity.get("city"),
-                "street_name": result.entity.get("street_name"),
-                "street_number": result.entity.get("street_number"),
-                "similarity_score": float(result.distance)
-            })
+        formatted_results = _format_address_hits(hits)
         
+        if formatted_results:
+            query_cache.put(cache_key, formatted_results)
+
         return formatted_results
         
     except Exception as exc:
         logger.error(f"❌ Context search failed: {str(exc)}")
         return []
 
+def _most_recent_rows(collection, expr: str, limit: int) -> list:
+    """
+        Newest rows matching expr: scan (id, timestamp) in widening time windows, then fetch their payload
+    """
+
+    now = int(time.time())
+
+    for window in RECENCY_WINDOWS:
+        window_expr = expr if window is None else f"({expr}) and timestamp >= {now - window}"
+        ids = _newest_ids(collection, window_expr, limit)
+
+        if len(ids) >= limit:
+            break
+
+    if not ids:
+        return []
+
+    rows = {
+        row["id"]: row
+        for row in collection.query(expr=f"id in {json.dumps(ids, ensure_ascii=False)}", output_fields=ADDRESS_OUTPUT_FIELDS)
+    }
+
+    return [rows[row_id] for row_id in ids if row_id in rows]
+
+def _newest_ids(collection, expr: str, limit: int) -> list:
+    """
+        Ids of the newest rows matching expr, newest first, from an (id, timestamp) scan
+    """
+
+    iterator = collection.query_iterator(
+        batch_size=RECENCY_SCAN_BATCH,
+        expr=expr,
+        output_fields=["id", "timestamp"]
+    )
+    newest_ids = []
+    newest_timestamps = np.empty(0, dtype=np.int64)
+
+    try:
+        while batch := iterator.next():
+            ids = newest_ids + [row["id"] for row in batch]
+            timestamps = np.concatenate((
+                newest_timestamps,
+                np.fromiter((row["timestamp"] for row in batch), dtype=np.int64, count=len(batch))
+            ))
+
+            # Keep only the running top `limit` without sorting the batch
+            if len(timestamps) > limit:
+                keep = np.argpartition(-timestamps, limit - 1)[:limit]
+                ids = [ids[i] for i in keep]
+                timestamps = timestamps[keep]
+
+            newest_ids, newest_timestamps = ids, timestamps
+
+    finally:
+        iterator.close()
+
+    return [newest_ids[i] for i in np.argsort(-newest_timestamps, kind="stable")]
+
 async def search_by_recency(
         milvus_service: MilvusService,
         query: str, 
@@ -178,97 +341,63 @@ async def search_by_recency(
         logger.error("Collection not available for recency search")
         return []
 
-    try:             
-        milvus_service.collection.load()
-
-    except Exception as exc:
-        logger.error(f"❌ Collection load failed: {str(exc)}")
+    if limit <= 0:
         return []
-        
+
     # Query all records (or filter by query if provided)
-    if query.strip():
-        # If query provided, try to filter by address content
-        # Note: This is a simple text matching, not semantic search
-        expr = f"full_address like '%{query}%' or city like '%{query}%' or street_name like '%{query}%'"
+    if TOKEN_RE.search(query):
+        # If query provided, filter by city/street tokens via the scalar indexes
+        # Note: This is exact token matching, not semantic search
+        expr = _address_filter(query)
 
     else:
         # Get all records
         expr = "id != ''"
     
     try:
-        # Simple query sorted by timestamp (most recent first)
-        results = milvus_service.collection.query(
-            expr=expr,
-            output_fields=[
-                "id", "meter_value", "full_address", "confidence", "timestamp", 
-                "city", "street_name", "street_number"
-            ],
-            limit=limit * 2  # Get more records to sort properly
-        )
+        # Most recent first; only the selected rows are materialized with full payload
+        limited_results = await asyncio.to_thread(_most_recent_rows, milvus_service.pooled_collection(), expr, limit)
 
-    except Exception as query_error:
+    except Exception as exc:
         # If filtering fails, fall back to getting all records
-        logger.warning(f"Filtered query failed, getting all records: {str(query_error)}")
-        results = milvus_service.collection.query(
-            expr="id != ''",
-            output_fields=[
-                "id", "meter_value", "full_address", "confidence", "timestamp", 
-                "city", "street_name", "street_number"
-            ],
-            limit=limit * 2
-        )
+        logger.warning(f"Filtered query failed, getting all records: {str(exc)}")
+
+        try:
+            limited_results = await asyncio.to_thread(_most_recent_rows, milvus_service.pooled_collection(), "id != ''", limit)
+
+        except Exception as exc:
+            logger.error(f"❌ Recency search failed: {str(exc)}")
+            return []
     
-    if not results:
+    if not limited_results:
         logger.warning("No records found in collection")
         return []
     
-    # Convert Milvus results to serializable format and sort by timestamp
-    converted_results = []
-    for result in results:
-        converted_result = {}
-        for key, value in result.items():
-            # Handle numpy types
-            if hasattr(value, 'item'):  # numpy scalar
-                converted_result[key] = value.item()
-            elif hasattr(value, 'tolist'):  # numpy array
-                converted_result[key] = value.tolist()
-            else:
-                converted_result[key] = value
-        converted_results.append(converted_result)
-    
-    # Sort by timestamp descending (most recent first)
-    sorted_results = sorted(
-        converted_results, 
-        key=lambda x: x.get("timestamp", 0), 
-        reverse=True
-    )
-    
-    # Take only the requested limit
-    limited_results = sorted_results[:limit]
-    
     # Convert to same format as similarity search results
-    formatted_results = []
-    for i, result in enumerate(limited_results):
-        formatted_result = {
-            "id": result.get("id", ""),
-            "meter_value": float(result.get("meter_value", 0)),
-            "full_address": result.get("full_address", ""),
-            "confidence": float(result.get("confidence", 0)),
-            "timestamp": int(result.get("timestamp", 0)),
-            "city": result.get("city", ""),
-            "street_name": result.get("street_name", ""),
-            "street_number": result.get("street_number", ""),
+    # Rows are plain dicts; the explicit float/int casts below already unwrap any numpy scalars
+    formatted_results = [
+        {
+            "id": result["id"],
+            "meter_value": float(result["meter_value"]),
+            "full_address": result["full_address"],
+            "confidence": float(result["confidence"]),
+            "timestamp": int(result["timestamp"]),
+            "city": result["city"],
+            "street_name": result["street_name"],
+            "street_number": result["street_number"],
             "similarity_score": 0.0,  # Perfect match for timestamp-based search
-            "rank": i + 1,
+            "rank": rank,
             "search_type": "recency"
         }
-        formatted_results.append(formatted_result)
+        for rank, result in enumerate(limited_results, 1)
+    ]
     
-    logger.info(f"✅ Found {len(formatted_results)} recent readings (query: '{query[:50]}...')")
+    logger.info("✅ Found %d recent readings (query: '%.50s...')", len(formatted_results), query)
     
     # Log first few results for debugging
-    for i, result in enumerate(formatted_results[:3]):
-        timestamp_readable = datetime.fromtimestamp(result["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-        logger.info(f"Recent result {i+1}: {result['full_address']} - {result['meter_value']} at {timestamp_readable}")
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, result in enumerate(formatted_results[:3]):
+            timestamp_readable = datetime.fromtimestamp(result["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+            logger.debug("Recent result %d: %s - %s at %s", i + 1, result["full_address"], result["meter_value"], timestamp_readable)
     
     return formatted_results